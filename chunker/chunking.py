@@ -0,0 +1,242 @@
+from collections import deque
+from functools import lru_cache
+import logging
+import os
+from billiard.pool import Pool
+import nltk
+from nltk import word_tokenize, pos_tag
+from nltk.chunk import RegexpParser
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores():
+    """
+    Number of cores this process may run on.
+    :return: CPU count honouring the scheduler affinity mask
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# 0 sizes the chunking pool to the available cores, 1 chunks in-process
+CHUNKER_PROCESSES = int(os.environ.get("CHUNKER_PROCESSES", 0)) or available_cores()
+
+
+def fixed_size_chunking(text, chunk_size=512):
+    """
+    Performs fixed-sized chunking on the text.
+    :param text: Text that is to be chunked
+    :param chunk_size: The fixed chunking size
+    :return: List of strings for each chun
+    """
+    tokens = word_tokenize(text)
+    chunks = [" ".join(tokens[i:i + chunk_size]) for i in
+              range(0, len(tokens), chunk_size)]
+    return chunks
+
+
+def sentence_based_chunking(text, num_sentences=5):
+    """
+    Performs sentence-based chunking on the text.
+    :param text: Text that is to be chunked
+    :param num_sentences: The number of sentences for each chunk
+    :return: List of strings for each chunk
+    """
+    sentences = nltk.sent_tokenize(text)
+    chunks = [" ".join(sentences[i:i + num_sentences]) for i in
+              range(0, len(sentences), num_sentences)]
+    return chunks
+
+
+# Define a grammar for chunking
+CHUNK_GRAMMAR = r"""
+    NP: {<DT|JJ|NN.*>+}          # Chunk sequences of DT, JJ, NN
+    VP: {<VB.*><NP|PP|CLAUSE>+$} # Chunk verbs and their arguments
+    PP: {<IN><NP>}               # Chunk prepositions followed by NP
+    CLAUSE: {<NP><VP>}           # Chunk NP, VP
+"""
+
+# Per-domain grammars; unknown domains use the default grammar
+DOMAIN_GRAMMARS = {
+    "default": CHUNK_GRAMMAR,
+    "legal": r"""
+        NP: {<DT|PRP\$>?<CD|JJ.*|NN.*|POS>+}   # Parties, sections, amounts
+        PP: {<IN|TO><NP>}                     # "pursuant to section 4"
+        VP: {<MD>?<VB.*>+<RB.*>?<NP|PP>*}     # "shall indemnify the party"
+    """,
+    "healthcare": r"""
+        NP: {<DT>?<CD|JJ.*|NN.*|HYPH>+}       # Conditions, drugs, dosages
+        PP: {<IN><NP>}                        # "of blood glucose"
+        VP: {<VB.*>+<RB.*>?<NP|PP>*}          # "reduces blood glucose"
+    """,
+}
+
+# Merged semantic chunks stay under this many word tokens
+SEMANTIC_TOKEN_BUDGET = int(os.environ.get("SEMANTIC_TOKEN_BUDGET", 128))
+
+
+@lru_cache(maxsize=None)
+def get_chunk_parser(grammar=CHUNK_GRAMMAR):
+    """
+    Compiles a chunk grammar once per process.
+    :param grammar: RegexpParser grammar
+    :return: RegexpParser
+    """
+    return RegexpParser(grammar)
+
+
+def _token_spans(text, tokens):
+    """
+    Aligns word_tokenize output back onto the text.
+    :return: (start, end) character offsets for each token
+    """
+    spans = []
+    cursor = 0
+    for token in tokens:
+        # word_tokenize rewrites double quotes as `` and ''
+        candidates = (token, '"') if token in ("``", "''") else (token,)
+        start = -1
+        for candidate in candidates:
+            start = text.find(candidate, cursor)
+            if start != -1:
+                break
+        if start == -1:
+            spans.append((cursor, cursor))
+            continue
+        cursor = start + len(candidate)
+        spans.append((start, cursor))
+    return spans
+
+
+def semantic_chunking(text, domain="default", grammar=None,
+                      token_budget=SEMANTIC_TOKEN_BUDGET):
+    """
+    Function for handling semantic chunking.
+    Parses the text with the domain's chunk grammar, flattens each parsed
+    phrase into its span of the original text and merges adjacent phrases
+    until token_budget is reached, preferring to end chunks on sentence ends.
+    :param text: Text that is to be chunked
+    :param domain: Key of DOMAIN_GRAMMARS
+    :param grammar: Grammar overriding the domain's grammar
+    :param token_budget: Maximum word tokens per merged chunk
+    :return: List of strings for each chunk
+    """
+    # Tokenize the text
+    tokens = word_tokenize(text)
+    if not tokens:
+        return []
+    spans = _token_spans(text, tokens)
+
+    # Perform part-of-speech tagging
+    pos_tags = pos_tag(tokens)
+
+    # Compiled once per process
+    chunk_parser = get_chunk_parser(
+        grammar or DOMAIN_GRAMMARS.get(domain, CHUNK_GRAMMAR))
+
+    # Perform chunking
+    tree = chunk_parser.parse(pos_tags)
+
+    chunks = []
+
+    def emit(first, last):
+        chunk = text[spans[first][0]:spans[last][1]].strip()
+        if chunk:
+            chunks.append(chunk)
+
+    # Each top-level subtree (or unchunked token) is one phrase of tokens.
+    # A chunk is closed before the next phrase once it is full, or when that
+    # phrase would overflow the budget; trailing punctuation always attaches.
+    start = 0
+    position = 0
+    full = False
+    for node in tree:
+        size = len(node.leaves()) if isinstance(node, nltk.Tree) else 1
+        punctuation = size == 1 and pos_tags[position][1] in (".", ",", ":")
+        if position > start and not punctuation and \
+                (full or position - start + size > token_budget):
+            emit(start, position - 1)
+            start = position
+        position += size
+        count = position - start
+        sentence_end = pos_tags[position - 1][1] == "."
+        full = count >= token_budget or (sentence_end and count >= token_budget // 2)
+    if start < position:
+        emit(start, position - 1)
+    return chunks
+
+
+CHUNKERS = {
+    "fixed_size": fixed_size_chunking,
+    "sentence_based": sentence_based_chunking,
+    "semantic": semantic_chunking,
+}
+
+
+def _init_chunk_worker():
+    """
+    Loads tokenizer, tagger and parser state once per pool process, so
+    documents after the first do not pay for unpickling the NLTK models.
+    """
+    nltk.sent_tokenize("Warm up.")
+    pos_tag(word_tokenize("Warm up the tagger."))
+    get_chunk_parser()
+
+
+def _chunk_document(args):
+    method, options, doc_id, text = args
+    return doc_id, CHUNKERS[method](text, **options)
+
+
+_pool = None
+
+
+def get_chunk_pool(processes=CHUNKER_PROCESSES):
+    """
+    Returns the chunking pool of this worker process, starting it on first
+    use. billiard is used because Celery's prefork children are daemonic and
+    may not start multiprocessing pools.
+    """
+    global _pool
+    if _pool is None:
+        logger.info(f"Starting chunking pool with {processes} processes")
+        _pool = Pool(processes=processes, initializer=_init_chunk_worker)
+    return _pool
+
+
+def shutdown_chunk_pool():
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+
+
+def chunk_documents(documents, method, options=None, processes=CHUNKER_PROCESSES):
+    """
+    Chunks documents in parallel across a process pool.
+    :param documents: Iterable of (doc_id, text) pairs
+    :param method: Key of CHUNKERS
+    :param options: Keyword arguments for the chunking function
+    :param processes: Pool size; 1 chunks in the calling process
+    :return: Generator of (doc_id, chunks) pairs in input order
+    """
+    options = options or {}
+    if processes <= 1:
+        for doc_id, text in documents:
+            yield doc_id, CHUNKERS[method](text, **options)
+        return
+
+    pool = get_chunk_pool(processes)
+    # Bounded look-ahead keeps every core busy without reading the whole
+    # corpus into the pool's task queue
+    in_flight = deque()
+    max_in_flight = processes * 2
+    for doc_id, text in documents:
+        in_flight.append(pool.apply_async(_chunk_document, ((method, options, doc_id, text),)))
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().get()
+    while in_flight:
+        yield in_flight.popleft().get()
@@ -0,0 +1,161 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Empty disables the cache. Kept off the /app/data documents bind mount,
+# which belongs to the host user rather than the worker's appuser
+EMBEDDING_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", "/app/embedding_cache")
+DIGEST_SIZE = 16
+
+
+def content_hash(text):
+    """
+    Digest identifying a chunk by its content.
+    :param text: Chunk text
+    :return: 16-byte blake2b digest
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+
+def _safe_name(name):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name)
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache for one (model name, chunking method) pair, keyed
+    by chunk content hash. Files in <cache_dir>/<model>/<method>/:
+        vectors.f32  float32 rows, memory-mapped for reads
+        keys.bin     16-byte content digests, one per row, in row order
+        meta.json    vector dimension
+    Rows are only visible once their key is written, and keys are written
+    after their vectors, so an interrupted append never exposes a bad row.
+    Appends from several worker processes are serialised with a file lock.
+    """
+
+    def __init__(self, cache_dir, model_name, method, dimension):
+        self.path = os.path.join(cache_dir, _safe_name(model_name), _safe_name(method))
+        self.dimension = dimension
+        self.row_bytes = dimension * np.dtype(np.float32).itemsize
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self.keys_path = os.path.join(self.path, "keys.bin")
+        self.lock_path = os.path.join(self.path, ".lock")
+        os.makedirs(self.path, exist_ok=True)
+
+        meta_path = os.path.join(self.path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as file:
+                cached_dimension = json.load(file)["dimension"]
+            if cached_dimension != dimension:
+                raise ValueError(f"Embedding cache {self.path} holds {cached_dimension}-d "
+                                 f"vectors, expected {dimension}")
+        else:
+            with open(meta_path, 'w') as file:
+                json.dump({"dimension": dimension}, file)
+
+        self._index = {}
+        self._rows = 0
+        self._vectors = None
+        self._lock = threading.Lock()
+        self._refresh()
+
+    def __len__(self):
+        return self._rows
+
+    def _refresh(self):
+        # Pick up rows appended since the last look, possibly by another process
+        key_rows = os.path.getsize(self.keys_path) // DIGEST_SIZE if os.path.exists(self.keys_path) else 0
+        vector_rows = os.path.getsize(self.vectors_path) // self.row_bytes if os.path.exists(self.vectors_path) else 0
+        rows = min(key_rows, vector_rows)
+        if rows == self._rows:
+            return
+
+        if rows > self._rows:
+            with open(self.keys_path, 'rb') as file:
+                file.seek(self._rows * DIGEST_SIZE)
+                keys = file.read((rows - self._rows) * DIGEST_SIZE)
+            for offset, row in enumerate(range(self._rows, rows)):
+                self._index[keys[offset * DIGEST_SIZE:(offset + 1) * DIGEST_SIZE]] = row
+        self._rows = rows
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                  shape=(rows, self.dimension))
+
+    def get_many(self, texts):
+        """
+        Looks up a batch of chunks.
+        :param texts: Chunk texts
+        :return: (embeddings, hits, digests) where embeddings has a row per
+            text, filled where hits is True
+        """
+        digests = [content_hash(text) for text in texts]
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        with self._lock:
+            self._refresh()
+            rows = np.fromiter((self._index.get(digest, -1) for digest in digests),
+                               dtype=np.int64, count=len(digests))
+            hits = rows >= 0
+            if hits.any():
+                # One gather from the mapped file for the whole batch
+                embeddings[hits] = self._vectors[rows[hits]]
+        return embeddings, hits, digests
+
+    def add(self, digests, vectors):
+        """
+        Appends embeddings for chunks not already cached.
+        :param digests: Content digests from get_many
+        :param vectors: float32 array with a row per digest
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock, open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                new_rows = {}
+                for position, digest in enumerate(digests):
+                    if digest not in self._index and digest not in new_rows:
+                        new_rows[digest] = position
+                if not new_rows:
+                    return
+
+                positions = list(new_rows.values())
+                # Drop anything left past the last complete row by a crash
+                self._append(self.vectors_path, self._rows * self.row_bytes,
+                             np.ascontiguousarray(vectors[positions]).tobytes())
+                self._append(self.keys_path, self._rows * DIGEST_SIZE,
+                             b"".join(new_rows.keys()))
+                self._refresh()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _append(path, valid_bytes, data):
+        with open(path, 'ab') as file:
+            file.truncate(valid_bytes)
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+
+_caches = {}
+
+
+def get_embedding_cache(model_name, method, dimension, cache_dir=EMBEDDING_CACHE_DIR):
+    """
+    Returns the process-wide cache for a model and chunking method.
+    :return: EmbeddingCache, or None when caching is disabled
+    """
+    if not cache_dir:
+        return None
+    key = (cache_dir, model_name, method)
+    if key not in _caches:
+        _caches[key] = EmbeddingCache(cache_dir, model_name, method, dimension)
+        logger.info(f"Opened embedding cache {_caches[key].path} "
+                    f"with {len(_caches[key])} entries")
+    return _caches[key]
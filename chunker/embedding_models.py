@@ -0,0 +1,120 @@
+from collections import OrderedDict
+import logging
+import os
+import threading
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.environ.get("EMBEDDING_MODEL", "paraphrase-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", 256))
+
+
+def default_device():
+    """
+    Device used when a caller does not ask for one.
+    :return: EMBEDDING_DEVICE if set, otherwise cuda when available, else cpu
+    """
+    device = os.environ.get("EMBEDDING_DEVICE")
+    if device:
+        return device
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class EmbeddingModelRegistry:
+    """
+    Process-wide cache of loaded SentenceTransformer models, keyed by
+    (model name, device). The least recently used model is evicted once more
+    than max_models are loaded.
+    """
+
+    def __init__(self, max_models=2):
+        self.max_models = max(1, max_models)
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_name=DEFAULT_MODEL, device=None):
+        """
+        Returns the model, loading it on first use.
+        :param model_name: SentenceTransformer model name or path
+        :param device: Torch device, defaults to default_device()
+        :return: Loaded SentenceTransformer
+        """
+        key = (model_name, device or default_device())
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+
+            logger.info(f"Loading embedding model {key[0]} on {key[1]}")
+            model = SentenceTransformer(key[0], device=key[1])
+            self._models[key] = model
+            while len(self._models) > self.max_models:
+                evicted, _ = self._models.popitem(last=False)
+                logger.info(f"Evicted embedding model {evicted[0]} on {evicted[1]}")
+            return model
+
+    def preload(self, model_names, device=None):
+        """
+        Loads the given models ahead of the first task.
+        :param model_names: Iterable of model names
+        :param device: Torch device, defaults to default_device()
+        """
+        for model_name in model_names:
+            self.get(model_name, device)
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models.keys())
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+registry = EmbeddingModelRegistry(
+    int(os.environ.get("EMBEDDING_MODEL_CACHE_SIZE", 2))
+)
+
+
+def embed_corpus(texts, batch_size=EMBEDDING_BATCH_SIZE, model_name=DEFAULT_MODEL,
+                 device=None, cache=None):
+    """
+    Embeds chunks gathered from the whole corpus in large batches. Chunks are
+    sorted by approximate token length (word count) first, so each batch holds
+    similarly sized inputs and little compute is spent on padding.
+    :param texts: Chunk texts from all documents
+    :param batch_size: Number of chunks per model.encode call
+    :param model_name: Embedding model name
+    :param device: Torch device, defaults to the registry's device
+    :param cache: Optional EmbeddingCache; only cache misses are encoded
+    :return: float32 array with one row per input text, in input order
+    """
+    model = registry.get(model_name, device)
+    dimension = model.get_sentence_embedding_dimension()
+    if cache is not None:
+        embeddings, hits, digests = cache.get_many(texts)
+        missing = np.flatnonzero(~hits)
+    else:
+        embeddings = np.empty((len(texts), dimension), dtype=np.float32)
+        missing = np.arange(len(texts))
+    if len(missing) == 0:
+        return embeddings
+
+    lengths = np.fromiter((len(texts[i].split()) for i in missing),
+                          dtype=np.int64, count=len(missing))
+    order = missing[np.argsort(lengths, kind="stable")]
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        embeddings[batch] = model.encode([texts[i] for i in batch],
+                                         batch_size=len(batch),
+                                         convert_to_numpy=True)
+
+    if cache is not None:
+        cache.add([digests[i] for i in missing], embeddings[missing])
+        logger.info(f"Embedding cache: {len(texts) - len(missing)} hits, "
+                    f"{len(missing)} misses")
+    return embeddings
@@ -0,0 +1,83 @@
+# benchmark_pool.py
+#
+# Compares per-task latency of the cold start-run-remove container path with
+# the warm worker pool. Run from inside the gaia container:
+#
+#   python benchmark_pool.py --tools chunker llm --runs 10
+
+import argparse
+import json
+import statistics
+import time
+
+from tasks import TASK_NAMES, TOOL_RESULT_TIMEOUT, dispatch_warm, pool, run_in_container
+
+DEFAULT_PAYLOADS = {
+    "chunker": {"docsSource": "/app/data", "chunkingMethod": "sentence_based"},
+    "vector_db": {"textData": "This is a test message from GAIA"},
+    "graph_db": {"textData": "Thorin Ironfist seeks the Arkenstone.",
+                 "queries": ["What is the main quest of Thorin Ironfist?"]},
+    "llm": {"queries": ["What is the main quest of Thorin Ironfist?"],
+            "llm": "bert-base-uncased"},
+    "prompt": {"id": "benchmark", "domain": "fantasy", "docsSource": "/app/data",
+               "queries": ["What is the main quest of Thorin Ironfist?"]},
+}
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return {
+        "runs": len(ordered),
+        "mean": statistics.mean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def bench_cold(tool, payload, runs):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_in_container(tool, payload)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def bench_warm(tool, payload, runs):
+    # Warm-up task so the pool and the worker's models are loaded
+    pool.scale(tool, 1)
+    dispatch_warm(tool, payload).get(timeout=TOOL_RESULT_TIMEOUT)
+
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        dispatch_warm(tool, payload).get(timeout=TOOL_RESULT_TIMEOUT)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold container vs warm pool latency")
+    parser.add_argument("--tools", nargs="+", default=list(TASK_NAMES.keys()))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {}
+    for tool in args.tools:
+        payload = json.dumps(DEFAULT_PAYLOADS.get(tool, {}))
+        print(f"Benchmarking {tool}...")
+        report[tool] = {
+            "cold": bench_cold(tool, payload, args.runs),
+            "warm": bench_warm(tool, payload, args.runs),
+        }
+        cold, warm = report[tool]["cold"], report[tool]["warm"]
+        print(f"{tool}: cold mean {cold['mean']:.3f}s p95 {cold['p95']:.3f}s | "
+              f"warm mean {warm['mean']:.3f}s p95 {warm['p95']:.3f}s | "
+              f"speedup x{cold['mean'] / max(warm['mean'], 1e-9):.1f}")
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
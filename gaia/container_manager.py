@@ -1,12 +1,16 @@
 import docker
 import logging
+import os
+from utils.result_channel import read_result
 
 class ContainerManager:
     def __init__(self):
         self.client = docker.DockerClient(base_url='unix://var/run/docker.sock')
         self.logger = logging.getLogger(__name__)
 
-    def start_container(self, image_name, env_vars=None, command=None):
+    def start_container(self, image_name, env_vars=None, command=None,
+                        name=None, hostname=None, labels=None, network=None,
+                        volumes=None):
         self.logger.info(f"Starting container with image {image_name}")
         try:
             container = self.client.containers.run(
@@ -14,6 +18,11 @@ class ContainerManager:
                 detach=True,
                 environment=env_vars,
                 command=command,
+                name=name,
+                hostname=hostname,
+                labels=labels,
+                network=network,
+                volumes=volumes,
             )
             return container
         except Exception as e:
@@ -29,5 +38,30 @@ class ContainerManager:
         except Exception as e:
             self.logger.error(f"Error stopping container: {e}")
 
+    def list_containers(self, labels):
+        """
+        Return running containers carrying all of the given labels.
+        """
+        filters = {"label": [f"{key}={value}" for key, value in labels.items()],
+                   "status": "running"}
+        return self.client.containers.list(filters=filters)
+
     def get_logs(self, container):
         return container.logs().decode('utf-8')
+
+    def get_result(self, container, result_path):
+        """
+        Read the framed result a tool wrote to the shared result volume.
+        Container logs stay a separate, diagnostic-only channel.
+        """
+        status = container.wait()
+        try:
+            return read_result(result_path)
+        except FileNotFoundError:
+            exit_code = status.get("StatusCode") if isinstance(status, dict) else status
+            self.logger.error(f"Container {container.id} exited with {exit_code} "
+                              f"without writing a result:\n{self.get_logs(container)}")
+            raise
+        finally:
+            if os.path.exists(result_path):
+                os.remove(result_path)
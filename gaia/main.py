@@ -1,14 +1,13 @@
 # main.py
 
-import os
 import time
 import threading
 import json
-from tasks import TASK_NAMES, app  # Importing TASK_NAMES and app from tasks.py
+from tasks import TASK_NAMES, TOOL_RESULT_TIMEOUT, app, dispatch, pool  # Importing TASK_NAMES and app from tasks.py
 from autoscaler import Autoscaler
 from utils.monitoring import get_queue_length
 from utils.db import init_db, save_result
-from utils.data_models import ProjectData, KnowledgeGraph, ChunkerConfig, LLMConfig
+from utils.data_models import ProjectData, KnowledgeGraph, ChunkerConfig, LLMConfig, Prompts
 from kombu import Queue
 
 
@@ -20,18 +19,65 @@ def calculate_desired_containers(queue_length):
 
 
 def monitor_and_scale():
-    autoscaler = Autoscaler()
+    autoscaler = Autoscaler(pool)
     while True:
         for tool, task_name in TASK_NAMES.items():
-            # Assuming only 'llm' tasks require autoscaling
-            if tool == "llm":
+            try:
                 queue_length = get_queue_length(tool)
                 desired_containers = calculate_desired_containers(queue_length)
-                image_name = os.environ.get("DOCKER_IMAGE_LLM", "llm")
-                autoscaler.scale_containers(desired_containers, image_name)
+                autoscaler.scale_containers(desired_containers, tool)
+            except Exception as e:
+                print(f"Error scaling {tool}: {str(e)}")
+        autoscaler.reap()
         time.sleep(10)  # Adjust the sleep time as needed
 
 
+def build_rag_text(project, chunker_result):
+    """
+    Index the chunker's output in a vector_db collection named after the
+    project, then run hybrid retrieval for the project's queries. The
+    collection is dropped afterwards, so runs do not pile up on the
+    vector_data volume.
+    :return: ragText for the prompt generators
+    """
+    try:
+        insert_data = dict(chunker_result, operation="insert", collection=project.id)
+        insert_result = json.loads(dispatch("vector_db", json.dumps(insert_data))
+                                   .get(timeout=TOOL_RESULT_TIMEOUT))
+        if "error" in insert_result:
+            raise RuntimeError(insert_result["error"])
+        project.vectorDBLoaded = True
+
+        retrieve_data = {"operation": "retrieve", "collection": project.id, "queries": project.queries}
+        retrieve_result = json.loads(dispatch("vector_db", json.dumps(retrieve_data))
+                                     .get(timeout=TOOL_RESULT_TIMEOUT))
+        if "error" in retrieve_result:
+            raise RuntimeError(retrieve_result["error"])
+        project.similarityIndices = retrieve_result.get("similarityIndices", {})
+        return retrieve_result.get("ragText", "")
+    finally:
+        drop_data = json.dumps({"operation": "drop", "collection": project.id})
+        try:
+            dispatch("vector_db", drop_data).get(timeout=TOOL_RESULT_TIMEOUT)
+        except Exception as e:
+            print(f"Error dropping collection {project.id}: {str(e)}")
+
+
+def summarize_result(tool, result_dict):
+    """
+    What to print and store for a tool's result. The chunker's embeddings
+    are large, so only their shape is kept.
+    """
+    if tool != "chunker" or "error" in result_dict:
+        return result_dict
+    embeddings = result_dict.get("embeddings") or []
+    return {
+        "chunkingMethod": result_dict.get("chunkingMethod"),
+        "chunkCount": len(result_dict.get("chunks", [])),
+        "dimension": len(embeddings[0]) if embeddings else 0,
+    }
+
+
 # In main.py, modify run_test()
 def run_test():
     print("Starting GAIA processing...")
@@ -39,7 +85,7 @@ def run_test():
     # Create initial ProjectData object with test_doc path
     test_data = ProjectData(
         domain="fantasy",
-        docsSource="/app/chunker/data",  \
+        docsSource="/app/data",  \
         queries=["What is the main quest of Thorin Ironfist?"],
         status="processing"
     )
@@ -54,73 +100,80 @@ def run_test():
     
     results = {}
     task_states = {}
-    
+
+    def collect(tool, payload):
+        """
+        Wait for a dispatched tool and fold its result into test_data.
+        """
+        try:
+            task_states[tool] = 'PROCESSING'
+            result = results[tool].get(timeout=TOOL_RESULT_TIMEOUT)
+            result_dict = json.loads(result)
+            task_states[tool] = 'COMPLETED'
+            summary = summarize_result(tool, result_dict)
+            print(f"Received result from {tool}: {json.dumps(summary, indent=2)}")
+
+            # Update ProjectData based on tool results
+            if tool == "chunker":
+                test_data.chunker.chunks = result_dict.get("chunks", [])
+                test_data.ragText = build_rag_text(test_data, result_dict)
+            elif tool == "graph_db":
+                test_data.kg.kgTriples = result_dict.get("kgTriples", [])
+                test_data.kg.ner = result_dict.get("ner", [])
+            elif tool == "prompt":
+                test_data.prompts = Prompts(**result_dict.get("prompts", {}))
+            elif tool == "llm":
+                test_data.llm.llmResult = result_dict.get("llmResult", "")
+
+            save_result(tool, payload, result if summary is result_dict else json.dumps(summary))
+
+        except Exception as e:
+            task_states[tool] = 'FAILED'
+            print(f"Error processing {tool}: {str(e)}")
+            save_result(tool, payload, f"Error: {str(e)}")
+
     # Send tasks to all tools
     try:
         # Start chunker task
-        chunker_data = {
+        chunker_data = json.dumps({
             "docsSource": test_data.docsSource,
             "chunkingMethod": test_data.chunker.chunkingMethod
-        }
-        print(f"Sending data to chunker: {json.dumps(chunker_data, indent=2)}")
-        results["chunker"] = app.send_task(TASK_NAMES["chunker"], args=[json.dumps(chunker_data)], queue="chunker")
+        })
+        print(f"Sending data to chunker: {chunker_data}")
+        results["chunker"] = dispatch("chunker", chunker_data)
         task_states["chunker"] = 'PENDING'
-        
-        
-        graph_data = {
+
+        graph_data = json.dumps({
             "queries": test_data.queries,
-            "waitForChunks": True  
-        }
-        print(f"Sending data to graph_db: {json.dumps(graph_data, indent=2)}")
-        results["graph_db"] = app.send_task(TASK_NAMES["graph_db"], args=[json.dumps(graph_data)], queue="graph_db")
+            "waitForChunks": True
+        })
+        print(f"Sending data to graph_db: {graph_data}")
+        results["graph_db"] = dispatch("graph_db", graph_data)
         task_states["graph_db"] = 'PENDING'
-        
-        
-        prompt_data = {
-            "queries": test_data.queries,
-            "waitForKG": True  
-        }
-        print(f"Sending data to prompt: {json.dumps(prompt_data, indent=2)}")
-        results["prompt"] = app.send_task(TASK_NAMES["prompt"], args=[json.dumps(prompt_data)], queue="prompt")
+
+        # The prompt and llm tools consume ragText and the KG triples, so
+        # they are only dispatched once the chunker (and from its chunks,
+        # build_rag_text) and graph_db have finished
+        collect("chunker", chunker_data)
+        collect("graph_db", graph_data)
+
+        prompt_data = test_data.to_json()
+        print(f"Sending data to prompt: {prompt_data}")
+        results["prompt"] = dispatch("prompt", prompt_data)
         task_states["prompt"] = 'PENDING'
-        
-        
-        llm_data = {
+
+        llm_data = json.dumps({
             "queries": test_data.queries,
             "llm": test_data.llm.llm,
-            "waitForPrompts": True  
-        }
-        print(f"Sending data to llm: {json.dumps(llm_data, indent=2)}")
-        results["llm"] = app.send_task(TASK_NAMES["llm"], args=[json.dumps(llm_data)], queue="llm")
+            "textData": test_data.ragText or ""
+        })
+        print(f"Sending data to llm: {llm_data}")
+        results["llm"] = dispatch("llm", llm_data)
         task_states["llm"] = 'PENDING'
-        
-        # Collect results as they complete
-        for tool, task in results.items():
-            try:
-                task_states[tool] = 'PROCESSING'
-                result = task.get(timeout=60)
-                result_dict = json.loads(result)
-                task_states[tool] = 'COMPLETED'
-                print(f"Received result from {tool}: {json.dumps(result_dict, indent=2)}")
-                
-                # Update ProjectData based on tool results
-                if tool == "chunker":
-                    test_data.chunker.chunks = result_dict.get("chunks", [])
-                elif tool == "graph_db":
-                    test_data.kg.kgTriples = result_dict.get("kgTriples", [])
-                    test_data.kg.ner = result_dict.get("ner", [])
-                elif tool == "prompt":
-                    test_data.prompts = result_dict
-                elif tool == "llm":
-                    test_data.llm.llmResult = result_dict.get("llmResult", "")
-                
-                save_result(tool, json.dumps(llm_data), result)
-                
-            except Exception as e:
-                task_states[tool] = 'FAILED'
-                print(f"Error processing {tool}: {str(e)}")
-                save_result(tool, json.dumps(llm_data), f"Error: {str(e)}")
-                
+
+        collect("prompt", prompt_data)
+        collect("llm", llm_data)
+
     except Exception as e:
         print(f"Error initiating tasks: {str(e)}")
     
@@ -178,6 +231,9 @@ if __name__ == "__main__":
     # Initialize the database
     init_db()
     
+    # Bring the warm tool worker pool up to its minimum size
+    pool.warm()
+    
     # Start the monitoring thread
     monitor_thread = threading.Thread(target=monitor_and_scale, daemon=True)
     monitor_thread.start()
@@ -55,6 +55,7 @@ class ProjectData:
     kg: KnowledgeGraph = field(default_factory=KnowledgeGraph)
     chunker: ChunkerConfig = field(default_factory=ChunkerConfig)
     llm: LLMConfig = field(default_factory=LLMConfig)
+    prompts: Prompts = field(default_factory=Prompts)
     vectorDBLoaded: bool = False
     similarityIndices: Dict[str, Any] = field(default_factory=dict)
     generatedResponse: Optional[str] = None
@@ -81,6 +82,8 @@ class ProjectData:
             data['chunker'] = ChunkerConfig(**data['chunker'])
         if 'llm' in data:
             data['llm'] = LLMConfig(**data['llm'])
+        if 'prompts' in data:
+            data['prompts'] = Prompts(**data['prompts'])
         return cls(**data)
 
     @classmethod
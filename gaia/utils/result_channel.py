@@ -0,0 +1,102 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+# Frame layout: magic, format version, payload length, crc32 of the payload,
+# followed by the UTF-8 JSON payload itself.
+MAGIC = b"GAIA"
+VERSION = 1
+HEADER = struct.Struct(">4sBQI")
+
+RESULT_DIR = os.environ.get("RESULT_DIR", "/app/results")
+
+
+class ResultFrameError(Exception):
+    pass
+
+
+def write_result(path, result):
+    """
+    Write a single framed result. The frame is written to a temporary file and
+    renamed into place, so a reader never sees a partial payload.
+    """
+    if not isinstance(result, (str, bytes)):
+        result = json.dumps(result)
+    payload = result.encode('utf-8') if isinstance(result, str) else result
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(payload), zlib.crc32(payload)))
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def emit_result(result):
+    """
+    Emit a tool's result on the result channel named by RESULT_PATH, falling
+    back to stdout when the tool is run by hand.
+    """
+    path = os.environ.get("RESULT_PATH")
+    if path:
+        write_result(path, result)
+    else:
+        sys.stdout.write(result if isinstance(result, str) else json.dumps(result))
+        sys.stdout.flush()
+
+
+def read_input():
+    """
+    The input of a one-shot tool run: the framed payload at INPUT_PATH,
+    or the INPUT_DATA string when the tool is run by hand. None when
+    neither is set, i.e. the tool should start as a Celery worker.
+    """
+    path = os.environ.get("INPUT_PATH")
+    if path:
+        return read_result(path)
+    return os.environ.get("INPUT_DATA") or None
+
+
+def read_result(path):
+    """
+    Read a framed result and return its JSON payload as a string. The file is
+    memory-mapped and the payload is checked and decoded straight from the
+    mapping, without an intermediate bytes copy.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            raise ResultFrameError(f"Result frame {path} is truncated")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, length, crc = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ResultFrameError(f"Unrecognised result frame in {path}")
+            if HEADER.size + length > size:
+                raise ResultFrameError(f"Result frame {path} is truncated")
+
+            view = memoryview(mm)[HEADER.size:HEADER.size + length]
+            try:
+                if zlib.crc32(view) != crc:
+                    raise ResultFrameError(f"Result frame {path} failed its checksum")
+                return str(view, 'utf-8')
+            finally:
+                view.release()
+
+
+def load_result(path):
+    """
+    Read a framed result and deserialize its JSON payload.
+    """
+    return json.loads(read_result(path))
+
+
+def prepare_result_dir(directory=RESULT_DIR):
+    # Tool containers run as an unprivileged user, so the shared directory
+    # must be writable by everyone (sticky, like /tmp)
+    os.makedirs(directory, exist_ok=True)
+    os.chmod(directory, 0o1777)
+    return directory
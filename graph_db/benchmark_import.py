@@ -0,0 +1,81 @@
+# benchmark_import.py
+#
+# Measures triple import throughput against a local Neo4j: the old
+# one-transaction-per-triple path versus bulk UNWIND batches. Every run
+# starts from an empty database, so point it at a scratch instance:
+#
+#   python benchmark_import.py --triples 20000 --batch-sizes 500 5000
+
+import argparse
+import json
+import random
+import time
+
+from neo4j_input import Neo4jTripleImporter
+
+
+def synthetic_triples(count, entities, predicates, seed=0):
+    """
+    Random triples over a fixed vocabulary, with some duplicates.
+    """
+    rng = random.Random(seed)
+    return [(f"entity {rng.randrange(entities)}",
+             f"relation {rng.randrange(predicates)}",
+             f"entity {rng.randrange(entities)}") for _ in range(count)]
+
+
+def clear(importer):
+    with importer.session() as session:
+        session.run("MATCH (n:Entity) DETACH DELETE n").consume()
+
+
+def import_per_triple(importer, triples):
+    # The import path before bulk loading: three MERGEs per round trip
+    def create_relationship(tx, subj, pred, obj):
+        tx.run("""
+        MERGE (s:Entity {name: $subj})
+        MERGE (o:Entity {name: $obj})
+        MERGE (s)-[:RELATIONSHIP {type: $pred}]->(o)
+        """, subj=subj, pred=pred, obj=obj).consume()
+
+    with importer.session() as session:
+        for subj, pred, obj in triples:
+            session.execute_write(create_relationship, subj, pred, obj)
+    return len(triples)
+
+
+def timed(label, triples, run):
+    started = time.perf_counter()
+    written = run()
+    seconds = time.perf_counter() - started
+    return {"path": label, "triples": len(triples), "written": written,
+            "seconds": seconds, "triples_per_second": len(triples) / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Neo4j triple import throughput")
+    parser.add_argument("--triples", type=int, default=20000)
+    parser.add_argument("--entities", type=int, default=5000)
+    parser.add_argument("--predicates", type=int, default=50)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[500, 5000])
+    parser.add_argument("--skip-per-triple", action="store_true",
+                        help="Skip the slow one-transaction-per-triple baseline")
+    args = parser.parse_args()
+
+    triples = synthetic_triples(args.triples, args.entities, args.predicates)
+    importer = Neo4jTripleImporter()
+    importer.ensure_schema()
+
+    if not args.skip_per_triple:
+        clear(importer)
+        print(json.dumps(timed("per_triple", triples,
+                               lambda: import_per_triple(importer, triples))))
+    for batch_size in args.batch_sizes:
+        clear(importer)
+        print(json.dumps(timed(f"unwind_{batch_size}", triples,
+                               lambda: importer.import_triples(triples, batch_size=batch_size))))
+    clear(importer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+from array import array
+from typing import Iterable, List, Tuple
+import logging
+import threading
+import numpy as np
+from name_index import TrigramIndex
+from questions import TREATMENT_PREDICATES, parse_questions, question_filter
+
+logger = logging.getLogger(__name__)
+
+
+def _gather(order, offsets, keys):
+    # Concatenated CSR slices order[offsets[k]:offsets[k + 1]] for every key
+    starts = offsets[keys]
+    counts = offsets[keys + 1] - starts
+    if counts.sum() == 0:
+        return np.empty(0, dtype=np.int64)
+    shifts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return order[shifts + np.arange(counts.sum())]
+
+
+class InMemoryKnowledgeGraph:
+    """
+    Embedded knowledge-graph backend with the Neo4jTripleImporter interface.
+
+    Entity and predicate names are interned to integer ids, and edges live in
+    three parallel int64 arrays (source, predicate, target). Outgoing,
+    incoming and per-predicate adjacency are CSR views over those arrays,
+    rebuilt lazily after imports. A trigram index over entity names answers
+    the substring matches that the Cypher templates do with CONTAINS.
+
+    Entities carry no properties, so the "latest" ordering does not apply.
+
+    The graph is not persisted or shared: it holds what this process
+    imported since it started. graph_db/Dockerfile's command therefore starts
+    the worker with --pool=threads when GRAPH_BACKEND=memory (a worker
+    started by hand must pass it too), and a deployment should run a single
+    graph_db worker (e.g. POOL_GRAPH_DB_MAX=1).
+    """
+
+    def __init__(self):
+        self.entities = []
+        self.entity_ids = {}
+        self.predicates = []
+        self.predicate_ids = {}
+        self.edge_src = array('q')
+        self.edge_pred = array('q')
+        self.edge_dst = array('q')
+        self._edge_keys = set()
+        self.name_index = TrigramIndex()
+        self._adjacency = None
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.edge_src)
+
+    def _entity(self, name):
+        entity_id = self.entity_ids.get(name)
+        if entity_id is None:
+            entity_id = self.entity_ids[name] = len(self.entities)
+            self.entities.append(name)
+            self.name_index.add(entity_id, name)
+        return entity_id
+
+    def _predicate(self, name):
+        predicate_id = self.predicate_ids.get(name)
+        if predicate_id is None:
+            predicate_id = self.predicate_ids[name] = len(self.predicates)
+            self.predicates.append(name)
+        return predicate_id
+
+    def import_triples(self, triples: Iterable[Tuple[str, str, str]], batch_size: int = None) -> int:
+        """
+        Adds triples, skipping ones already in the graph.
+        :param triples: Iterable of (subject, predicate, object), may be a generator
+        :param batch_size: Unused, accepted for interface compatibility
+        :return: Number of new triples
+        """
+        written = 0
+        with self.lock:
+            for subj, pred, obj in triples:
+                key = (self._entity(subj), self._predicate(pred), self._entity(obj))
+                if key in self._edge_keys:
+                    continue
+                self._edge_keys.add(key)
+                self.edge_src.append(key[0])
+                self.edge_pred.append(key[1])
+                self.edge_dst.append(key[2])
+                written += 1
+            if written:
+                self._adjacency = None
+        logger.info(f"Imported {written} triples into the in-memory graph")
+        return written
+
+    def _csr(self):
+        if self._adjacency is None:
+            adjacency = {}
+            columns = {"out": (self.edge_src, len(self.entities)),
+                       "in": (self.edge_dst, len(self.entities)),
+                       "pred": (self.edge_pred, len(self.predicates))}
+            for name, (column, size) in columns.items():
+                keys = np.frombuffer(column, dtype=np.int64) if len(column) else np.empty(0, dtype=np.int64)
+                order = np.argsort(keys, kind="stable")
+                offsets = np.concatenate([[0], np.cumsum(np.bincount(keys, minlength=size))])
+                adjacency[name] = (order, offsets)
+            self._adjacency = adjacency
+        return self._adjacency
+
+    def edges(self, direction, keys):
+        """
+        Edge indices leaving ("out") or entering ("in") the given entities,
+        or carrying the given predicates ("pred"), in insertion order.
+        """
+        order, offsets = self._csr()[direction]
+        return np.sort(_gather(order, offsets, np.asarray(keys, dtype=np.int64)))
+
+    def triples(self, edges) -> List[Tuple[str, str, str]]:
+        return [(self.entities[self.edge_src[e]], self.predicates[self.edge_pred[e]],
+                 self.entities[self.edge_dst[e]]) for e in edges]
+
+    def _answer(self, row, limit):
+        subject = row["subject"]
+        subjects = self.name_index.search(subject) if subject else None
+        if row["treatment"]:
+            predicates = [predicate_id for predicate_id, name in enumerate(self.predicates)
+                          if any(word in name for word in TREATMENT_PREDICATES)]
+            if subjects is None:
+                edges = self.edges("pred", predicates)
+            else:
+                edges = self.edges("out", subjects)
+                edges = edges[np.isin(np.frombuffer(self.edge_pred, dtype=np.int64)[edges], predicates)]
+        elif subjects is None:
+            edges = np.arange(min(limit, len(self)))
+        else:
+            edges = np.union1d(self.edges("out", subjects), self.edges("in", subjects))
+        return self.triples(edges[:limit].tolist())
+
+    def process_questions(self, questions: List[str]) -> List[dict]:
+        return parse_questions(questions)
+
+    def query_knowledge_graph(self, question: str) -> List[Tuple[str, str, str]]:
+        return self.query_knowledge_graph_many([question])[0]
+
+    def query_knowledge_graph_many(self, questions: List[str], limit: int = 5) -> List[List[Tuple[str, str, str]]]:
+        """
+        Answer a batch of questions.
+        :return: One list of (subject, predicate, object) triples per question
+        """
+        if not questions:
+            return []
+        rows = [question_filter(idx, elements)
+                for idx, elements in enumerate(self.process_questions(questions))]
+        with self.lock:
+            return [self._answer(row, limit) for row in rows]
+
+
+# Process-wide graph; with GRAPH_BACKEND=memory it lives as long as the worker
+graph = InMemoryKnowledgeGraph()
@@ -0,0 +1,98 @@
+from array import array
+from bisect import bisect_left
+import threading
+import numpy as np
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Substring and prefix lookup over entity names by integer id.
+
+    Every lowercased name is split into character trigrams; each trigram maps
+    to an array of the ids containing it. Ids are added in increasing order,
+    so posting arrays stay sorted and intersect without sorting. A substring
+    query intersects the postings of its own trigrams and verifies the few
+    remaining candidates, instead of scanning every name.
+    """
+
+    def __init__(self):
+        self.keys = {}
+        self._postings = {}
+        self._sorted = []
+        self._sorted_dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, entity_id, name):
+        """
+        Indexes a name. Ids must be added in increasing order.
+        """
+        key = name.lower()
+        with self._lock:
+            if entity_id in self.keys:
+                return
+            self.keys[entity_id] = key
+            for gram in trigrams(key):
+                postings = self._postings.get(gram)
+                if postings is None:
+                    postings = self._postings[gram] = array('q')
+                postings.append(entity_id)
+            self._sorted_dirty = True
+
+    def search(self, substring, limit=None):
+        """
+        Ids of names containing substring, in id order.
+        """
+        substring = substring.lower()
+        with self._lock:
+            grams = trigrams(substring)
+            if not grams:
+                # Too short for a trigram: check every name
+                matches = [entity_id for entity_id, key in self.keys.items() if substring in key]
+                return matches[:limit] if limit else matches
+
+            postings = []
+            for gram in grams:
+                if gram not in self._postings:
+                    return []
+                postings.append(self._postings[gram])
+            postings.sort(key=len)
+            candidates = np.frombuffer(postings[0], dtype=np.int64)
+            for other in postings[1:]:
+                # Once few candidates remain, verifying them beats intersecting
+                # with long posting arrays
+                if len(candidates) <= 256 or len(other) > 16 * len(candidates):
+                    break
+                candidates = np.intersect1d(candidates, np.frombuffer(other, dtype=np.int64),
+                                            assume_unique=True)
+
+            matches = []
+            for entity_id in candidates.tolist():
+                # Trigrams can match out of order, so confirm the substring
+                if substring in self.keys[entity_id]:
+                    matches.append(entity_id)
+                    if limit and len(matches) >= limit:
+                        break
+            return matches
+
+    def prefix(self, prefix, limit=None):
+        """
+        Ids of names starting with prefix, in name order.
+        """
+        prefix = prefix.lower()
+        with self._lock:
+            if self._sorted_dirty:
+                self._sorted = sorted((key, entity_id) for entity_id, key in self.keys.items())
+                self._sorted_dirty = False
+            matches = []
+            for key, entity_id in self._sorted[bisect_left(self._sorted, (prefix,)):]:
+                if not key.startswith(prefix) or (limit and len(matches) >= limit):
+                    break
+                matches.append(entity_id)
+            return matches
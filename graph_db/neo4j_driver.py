@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from neo4j import GraphDatabase
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+@dataclass
+class Neo4jSettings:
+    """
+    Connection and pool settings for the graph_db Neo4j driver.
+    """
+    uri: str = "bolt://127.0.0.1:7687"
+    user: str = "neo4j"
+    password: str = ""
+    database: Optional[str] = None
+    max_pool_size: int = 50
+    max_connection_lifetime: float = 3600.0
+    acquisition_timeout: float = 60.0
+    # Pooled connections idle for longer are pinged before being handed out
+    liveness_check_timeout: Optional[float] = 30.0
+    # Seconds between driver-level connectivity checks
+    health_check_interval: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> 'Neo4jSettings':
+        liveness = os.environ.get("NEO4J_LIVENESS_CHECK_TIMEOUT")
+        return cls(
+            uri=os.environ.get("NEO4J_URI", cls.uri),
+            user=os.environ.get("NEO4J_USER", cls.user),
+            password=os.environ.get("NEO4J_PASSWORD", cls.password),
+            database=os.environ.get("NEO4J_DATABASE") or None,
+            max_pool_size=_env_int("NEO4J_MAX_POOL_SIZE", cls.max_pool_size),
+            max_connection_lifetime=_env_float("NEO4J_MAX_CONNECTION_LIFETIME",
+                                               cls.max_connection_lifetime),
+            acquisition_timeout=_env_float("NEO4J_CONNECTION_ACQUISITION_TIMEOUT",
+                                           cls.acquisition_timeout),
+            liveness_check_timeout=float(liveness) if liveness else cls.liveness_check_timeout,
+            health_check_interval=_env_float("NEO4J_HEALTH_CHECK_INTERVAL",
+                                             cls.health_check_interval),
+        )
+
+
+class DriverManager:
+    """
+    One long-lived, pooled Neo4j driver per process. Callers borrow a
+    session per operation; the driver and its connection pool outlive tasks.
+
+    The driver is created lazily, so each Celery prefork child opens its own
+    pool after the fork. Connectivity is verified when the driver is created
+    and again once health_check_interval has passed; a driver that fails the
+    check is replaced.
+    """
+
+    def __init__(self, settings: Optional[Neo4jSettings] = None):
+        self.settings = settings or Neo4jSettings.from_env()
+        self._driver = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _create(self):
+        settings = self.settings
+        logger.info(f"Connecting to Neo4j at {settings.uri} "
+                    f"(pool size {settings.max_pool_size})")
+        return GraphDatabase.driver(
+            settings.uri,
+            auth=(settings.user, settings.password),
+            max_connection_pool_size=settings.max_pool_size,
+            max_connection_lifetime=settings.max_connection_lifetime,
+            connection_acquisition_timeout=settings.acquisition_timeout,
+            liveness_check_timeout=settings.liveness_check_timeout,
+        )
+
+    def get_driver(self):
+        """
+        Returns the process-wide driver, creating or replacing it as needed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._driver is not None and now - self._checked_at < self.settings.health_check_interval:
+                return self._driver
+            if self._driver is not None and self._healthy(self._driver):
+                self._checked_at = now
+                return self._driver
+            if self._driver is not None:
+                logger.warning("Neo4j driver failed its health check, reconnecting")
+                self._close_driver()
+
+            driver = self._create()
+            driver.verify_connectivity()
+            self._driver = driver
+            self._checked_at = now
+            return driver
+
+    @staticmethod
+    def _healthy(driver):
+        try:
+            driver.verify_connectivity()
+            return True
+        except Exception as e:
+            logger.error(f"Neo4j health check failed: {e}")
+            return False
+
+    def health_check(self) -> bool:
+        """
+        Verifies connectivity now.
+        """
+        try:
+            return self._healthy(self.get_driver())
+        except Exception as e:
+            logger.error(f"Neo4j health check failed: {e}")
+            return False
+
+    @contextmanager
+    def session(self, **kwargs):
+        """
+        Borrows a session (and a pooled connection) for one operation.
+        """
+        if self.settings.database and "database" not in kwargs:
+            kwargs["database"] = self.settings.database
+        session = self.get_driver().session(**kwargs)
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def _close_driver(self):
+        try:
+            self._driver.close()
+        except Exception as e:
+            logger.error(f"Error closing Neo4j driver: {e}")
+        self._driver = None
+
+    def close(self):
+        with self._lock:
+            if self._driver is not None:
+                self._close_driver()
+
+
+driver_manager = DriverManager()
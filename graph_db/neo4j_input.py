@@ -1,136 +1,378 @@
-from neo4j import GraphDatabase
-from typing import List, Dict, Any, Tuple
+from typing import Iterable, List, Dict, Any, Tuple
+from itertools import islice
 import logging
+import os
+import re
+import threading
+import time
 from datetime import datetime
 from rdflib import Graph
 from rdflib_neo4j import Neo4jStoreConfig, Neo4jStore
+from name_index import TrigramIndex
+from neo4j_driver import driver_manager
+from questions import parse_questions, question_filter
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class Neo4jTripleImporter:
+# Triples sent per UNWIND transaction
+IMPORT_BATCH_SIZE = int(os.environ.get("NEO4J_IMPORT_BATCH_SIZE", 5000))
+
+# Client-side entity name lookup; resolving more candidates than this
+# falls back to the full-text index
+ENTITY_LOOKUP = os.environ.get("ENTITY_LOOKUP", "1") == "1"
+ENTITY_LOOKUP_MAX_CANDIDATES = int(os.environ.get("ENTITY_LOOKUP_MAX_CANDIDATES", 1000))
+# Seconds between background fetches of entities created by other workers
+ENTITY_LOOKUP_REFRESH = float(os.environ.get("ENTITY_LOOKUP_REFRESH", 10))
+# created is stamped when a transaction starts, not when it commits, so
+# incremental fetches look this far back past the newest stamp seen...
+ENTITY_LOOKUP_OVERLAP_MS = int(os.environ.get("ENTITY_LOOKUP_OVERLAP_MS", 300000))
+# ...and every this many seconds all names are paged in again, for
+# transactions that ran longer than the overlap
+ENTITY_LOOKUP_FULL_RESYNC = float(os.environ.get("ENTITY_LOOKUP_FULL_RESYNC", 900))
+# Names fetched per query while paging through every entity
+ENTITY_LOOKUP_PAGE_SIZE = int(os.environ.get("ENTITY_LOOKUP_PAGE_SIZE", 10000))
+# Graphs with more entities than this are left to the full-text index
+ENTITY_LOOKUP_MAX_NAMES = int(os.environ.get("ENTITY_LOOKUP_MAX_NAMES", 2000000))
+
+FULLTEXT_INDEX = "entity_name_fulltext"
+
+SCHEMA_QUERIES = [
+    # Uniqueness constraint, also backs MERGE on Entity.name with an index
+    "CREATE CONSTRAINT entity_name IF NOT EXISTS FOR (e:Entity) REQUIRE e.name IS UNIQUE",
+    f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX} IF NOT EXISTS FOR (e:Entity) ON EACH [e.name]",
+    # Lets the name lookup fetch only entities created since its last sync
+    "CREATE INDEX entity_created IF NOT EXISTS FOR (e:Entity) ON (e.created)",
+]
+
+IMPORT_QUERY = """
+UNWIND $rows AS row
+MERGE (s:Entity {name: row.subj})
+  ON CREATE SET s.created = timestamp()
+MERGE (o:Entity {name: row.obj})
+  ON CREATE SET o.created = timestamp()
+MERGE (s)-[:RELATIONSHIP {type: row.pred}]->(o)
+"""
+
+# Rows are resolved client-side to one of three modes:
+#   any       no subject, every relationship qualifies
+#   names     exact entity names from the client-side lookup (index seeks)
+#   fulltext  a full-text index query, verified with CONTAINS
+KG_QUERY = f"""
+UNWIND $rows AS row
+CALL {{
+    WITH row
+    WITH row WHERE row.mode = 'any'
+    MATCH (s:Entity)-[r:RELATIONSHIP]->(o:Entity)
+    WHERE (NOT row.treatment OR r.type CONTAINS 'treats' OR r.type CONTAINS 'used_for')
+      AND (NOT row.latest OR o.date IS NOT NULL)
+    WITH row, s, r, o
+    ORDER BY CASE WHEN row.latest THEN o.date END DESC
+    LIMIT 5
+    RETURN s.name AS subject, r.type AS predicate, o.name AS object
+  UNION
+    WITH row
+    WITH row WHERE row.mode <> 'any'
+    CALL {{
+        WITH row
+        WITH row WHERE row.mode = 'names'
+        UNWIND row.names AS name
+        MATCH (e:Entity {{name: name}})
+        RETURN e
+      UNION
+        WITH row
+        WITH row WHERE row.mode = 'fulltext'
+        CALL db.index.fulltext.queryNodes('{FULLTEXT_INDEX}', row.search) YIELD node
+        WITH row, node WHERE node.name CONTAINS row.subject
+        RETURN node AS e
+    }}
+    MATCH (e)-[r:RELATIONSHIP]-(:Entity)
+    WITH row, e, r, startNode(r) AS s, endNode(r) AS o
+    WHERE (NOT row.treatment OR s = e)
+      AND (NOT row.treatment OR r.type CONTAINS 'treats' OR r.type CONTAINS 'used_for')
+      AND (NOT row.latest OR o.date IS NOT NULL)
+    WITH DISTINCT row, s, r, o
+    ORDER BY CASE WHEN row.latest THEN o.date END DESC
+    LIMIT 5
+    RETURN s.name AS subject, r.type AS predicate, o.name AS object
+}}
+RETURN row.idx AS idx, subject, predicate, object
+"""
+
+LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+
+def fulltext_query(subject):
+    """
+    Lucene query matching names that contain every word of subject.
+    """
+    words = (LUCENE_SPECIAL.sub(r'\\\1', word) for word in subject.split())
+    return " AND ".join(f"*{word}*" for word in words)
+
+
+class EntityNameLookup:
+    """
+    Process-wide trigram/prefix lookup over Entity names, used to resolve a
+    question's subject to exact entity names before the Cypher call, so the
+    query seeks the name index instead of scanning every Entity.
+
+    The lookup is filled by a background thread, never on the query path:
+    it pages through every name once (seeking the Entity.name constraint's
+    index), then fetches entities by their created timestamp every
+    ENTITY_LOOKUP_REFRESH seconds. Until the first pass completes, resolve()
+    returns None and questions use the full-text index, so a partial lookup
+    never hides entities. Afterwards names mode can lag imports by other
+    workers by up to ENTITY_LOOKUP_REFRESH seconds; names written by this
+    process are added as they are imported.
+
+    created is the start time of the importing transaction, and a long
+    import can commit after a later-stamped one, so each fetch goes back
+    ENTITY_LOOKUP_OVERLAP_MS before the newest stamp seen, and every
+    ENTITY_LOOKUP_FULL_RESYNC seconds every name is paged in again. Graphs
+    with more than ENTITY_LOOKUP_MAX_NAMES entities disable the lookup.
+    """
+
     def __init__(self):
+        self.names = []
+        self.name_ids = {}
+        self.index = TrigramIndex()
+        self.complete = False
+        self.disabled = False
+        self.created_since = None
+        self.synced_at = None
+        self.full_synced_at = None
+        self._lock = threading.Lock()
+        self._thread_pid = None
+
+    def add(self, names):
+        with self._lock:
+            if self.disabled:
+                return
+            for name in names:
+                if name not in self.name_ids:
+                    self.name_ids[name] = len(self.names)
+                    self.index.add(len(self.names), name)
+                    self.names.append(name)
+
+    def _disable(self):
+        logger.warning(f"More than {ENTITY_LOOKUP_MAX_NAMES} entities, "
+                       f"resolving subjects with the full-text index only")
+        with self._lock:
+            self.disabled = True
+            self.complete = False
+            self.names, self.name_ids, self.index = [], {}, TrigramIndex()
+
+    def load(self, session, page_size=None):
+        """
+        Pages through every entity name in name order.
+        """
+        page_size = page_size or ENTITY_LOOKUP_PAGE_SIZE
+        # Entities committed while paging are picked up by the next refresh
+        started = session.run("RETURN timestamp() AS now").single()["now"]
+        after = ""
+        while True:
+            records = list(session.run("MATCH (e:Entity) WHERE e.name > $after "
+                                       "RETURN e.name AS name ORDER BY e.name LIMIT $limit",
+                                       after=after, limit=page_size))
+            self.add(record["name"] for record in records)
+            if len(self.names) > ENTITY_LOOKUP_MAX_NAMES:
+                self._disable()
+                return
+            if len(records) < page_size:
+                break
+            after = records[-1]["name"]
+        self.created_since = max(self.created_since or 0, started)
+        self.complete = True
+
+    def refresh(self, session):
+        """
+        Fetches entities created since the newest stamp seen, less the overlap.
         """
-        Initialize Neo4j connection.
+        # Re-reads the overlap window on every fetch; add() dedupes
+        records = list(session.run("MATCH (e:Entity) WHERE e.created >= $since "
+                                   "RETURN e.name AS name, e.created AS created",
+                                   since=self.created_since - ENTITY_LOOKUP_OVERLAP_MS))
+        self.add(record["name"] for record in records)
+        stamps = [record["created"] for record in records if record["created"] is not None]
+        self.created_since = max(stamps + [self.created_since])
+
+    def sync(self, session):
+        """
+        One background step: a full load when due, otherwise a refresh.
         """
-        # set the confguration to connect to your Aura DB
-        # TODO: modify uri according to container networking
-        self.DB_URI = "bolt://127.0.0.1:7687"
-        self.DB_USERNAME = "neo4j"
-        self.DB_PWD = ""
+        now = time.monotonic()
+        if self.full_synced_at is None or now - self.full_synced_at >= ENTITY_LOOKUP_FULL_RESYNC:
+            self.load(session)
+            self.full_synced_at = now
+        else:
+            self.refresh(session)
+        self.synced_at = now
 
-        # Configure the Neo4j connection
-        self.driver = GraphDatabase.driver(
-            uri=self.DB_URI,
-            auth=(self.DB_USERNAME, self.DB_PWD)
-        )
+    def start(self, manager):
+        """
+        Starts the background sync thread of this process, once per process
+        (prefork children do not inherit the parent's thread).
+        """
+        with self._lock:
+            if self.disabled or self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._run, args=(manager,), name="entity-lookup-sync",
+                         daemon=True).start()
 
-    def import_triples(self, triples: List[Tuple[str,str,str]]):
+    def _run(self, manager):
+        while not self.disabled:
+            try:
+                with manager.session() as session:
+                    self.sync(session)
+            except Exception as e:
+                logger.warning(f"Entity name lookup sync failed: {e}")
+            time.sleep(ENTITY_LOOKUP_REFRESH)
 
-        def create_relationship(tx, subj, pred, obj):
-            # Create nodes and relationship if they don't exist
-            query = """
-            MERGE (s:Entity {name: $subj})
-            MERGE (o:Entity {name: $obj})
-            MERGE (s)-[:RELATIONSHIP {type: $pred}]->(o)
-            """
-            tx.run(query, subj=subj, pred=pred, obj=obj)
+    def resolve(self, subject, limit=ENTITY_LOOKUP_MAX_CANDIDATES):
+        """
+        Names containing subject, or None when there are more than limit or
+        the lookup has not loaded every name yet.
+        """
+        if not self.complete:
+            return None
+        ids = self.index.search(subject, limit=limit + 1)
+        if len(ids) > limit:
+            return None
+        return [self.names[i] for i in ids]
 
-        with self.driver.session() as session:
-            for subj, pred, obj in triples:
-                session.execute_write(create_relationship, subj, pred, obj)
+
+entity_lookup = EntityNameLookup()
+
+class Neo4jTripleImporter:
+    # Database URIs whose schema this process has already ensured
+    _schema_ready = set()
+
+    def __init__(self, manager=None, lookup=None):
+        """
+        Use the process-wide pooled Neo4j driver; connection settings come
+        from NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD and friends.
+        """
+        self.manager = manager or driver_manager
+        self.lookup = lookup or (entity_lookup if ENTITY_LOOKUP else None)
+
+    @property
+    def driver(self):
+        return self.manager.get_driver()
+
+    def session(self):
+        """
+        Borrow a session for one operation.
+        """
+        return self.manager.session()
+
+    def ensure_schema(self):
+        """
+        Create the Entity.name constraint and index if they do not exist yet.
+        """
+        uri = self.manager.settings.uri
+        if uri in self._schema_ready:
+            return
+        with self.session() as session:
+            for query in SCHEMA_QUERIES:
+                session.run(query).consume()
+        self._schema_ready.add(uri)
+
+    def import_triples(self, triples: Iterable[Tuple[str,str,str]],
+                       batch_size: int = IMPORT_BATCH_SIZE) -> int:
+        """
+        Bulk-load triples with one parameterized UNWIND query per transaction.
+        Duplicates are dropped client-side before anything is sent.
+        :param triples: Iterable of (subject, predicate, object), may be a generator
+        :param batch_size: Triples per transaction
+        :return: Number of distinct triples written
+        """
+        self.ensure_schema()
+        seen = set()
+        unique = (triple for triple in map(tuple, triples)
+                  if not (triple in seen or seen.add(triple)))
+
+        def write_batch(tx, rows):
+            tx.run(IMPORT_QUERY, rows=rows).consume()
+
+        written = 0
+        with self.session() as session:
+            while True:
+                batch = [{"subj": subj, "pred": pred, "obj": obj}
+                         for subj, pred, obj in islice(unique, batch_size)]
+                if not batch:
+                    break
+                session.execute_write(write_batch, batch)
+                written += len(batch)
+                if self.lookup is not None:
+                    self.lookup.add(name for row in batch for name in (row["subj"], row["obj"]))
+        logger.info(f"Imported {written} triples")
+        return written
 
     def process_question(self, question: str) -> dict:
         """
         Process a natural language question to identify key elements for querying.
         """
-        nlp = spacy.load("en_core_web_sm")
-        doc = nlp(question.lower())
+        return parse_questions([question])[0]
 
-        query_elements = {
-            'focus': None,      # Main topic of question (e.g., "treatments")
-            'subject': None,    # Subject of interest (e.g., "diabetes")
-            'constraints': [],  # Additional constraints (e.g., "latest", "type 2")
-            'question_type': None  # What, How, Who, etc.
-        }
-
-        # Identify question type
-        for token in doc:
-            if token.tag_ == "WDT" or token.tag_ == "WP" or token.tag_ == "WRB":
-                query_elements['question_type'] = token.text
-                break
-            
-        # Find main focus and subject
-        for chunk in doc.noun_chunks:
-            if not query_elements['subject'] and any(word in chunk.text for word in ['diabetes', 'disease', 'condition']):
-                query_elements['subject'] = chunk.text
-            elif not query_elements['focus'] and any(word in chunk.text for word in ['treatment', 'therapy', 'medication']):
-                query_elements['focus'] = chunk.text
-
-        # Identify constraints
-        for token in doc:
-            if token.pos_ == "ADJ":
-                query_elements['constraints'].append(token.text)
-
-        return query_elements
-
-    def generate_neo4j_query(self, query_elements: dict) -> str:
-        """
-        Convert processed question elements into a Neo4j Cypher query.
-        """
-        if query_elements['focus'] == 'treatments' or 'treatment' in query_elements['focus']:
-            # Query for treatments
-            query = """
-            MATCH (condition:Entity)-[r:RELATIONSHIP]->(treatment:Entity)
-            WHERE condition.name CONTAINS $subject
-            AND (r.type CONTAINS 'treats' OR r.type CONTAINS 'used_for')
-            """
-
-            # Add constraint for "latest" if present
-            if 'latest' in query_elements['constraints']:
-                query += """
-                AND exists(treatment.date)
-                ORDER BY treatment.date DESC
-                """
-
-            query += """
-            RETURN condition.name as subject, r.type as predicate, treatment.name as object
-            LIMIT 5
-            """
+    def process_questions(self, questions: List[str]) -> List[dict]:
+        """
+        Parse all questions in a single nlp.pipe pass.
+        """
+        return parse_questions(questions)
 
-        else:
-            # Generic query pattern
-            query = """
-            MATCH (s:Entity)-[r:RELATIONSHIP]->(o:Entity)
-            WHERE (s.name CONTAINS $subject OR o.name CONTAINS $subject)
-            RETURN s.name as subject, r.type as predicate, o.name as object
-            LIMIT 5
-            """
+    def generate_neo4j_query(self, elements_list: List[dict]) -> Tuple[str, List[dict]]:
+        """
+        Convert processed question elements into one UNWIND Cypher query
+        covering every question, and its $rows parameter. Each row carries
+        the question index, so results come back tagged by question.
 
-        return query
+        Subjects are resolved to candidate entity names with the client-side
+        lookup first; subjects it cannot narrow down, and every subject until
+        the lookup has loaded all names, use the full-text index. Neither
+        path scans every Entity with CONTAINS. Names mode can lag imports by
+        other workers by up to ENTITY_LOOKUP_REFRESH seconds.
+        """
+        rows = []
+        for idx, elements in enumerate(elements_list):
+            row = question_filter(idx, elements)
+            names = None
+            if row["subject"] and self.lookup is not None:
+                names = self.lookup.resolve(row["subject"])
+            if not row["subject"]:
+                row["mode"] = "any"
+            elif names:
+                row["mode"], row["names"] = "names", names
+            else:
+                # Too many candidates, no lookup, or not synced yet
+                row["mode"], row["search"] = "fulltext", fulltext_query(row["subject"])
+            rows.append(row)
+        return KG_QUERY, rows
 
     def query_knowledge_graph(self, question: str) -> List[Tuple[str, str, str]]:
         """
         Query the Neo4j knowledge graph using natural language questions.
         """
-        # Process the question
-        query_elements = self.process_question(question)
+        return self.query_knowledge_graph_many([question])[0]
 
-        # Generate Neo4j query
-        query = self.generate_neo4j_query(query_elements)
-
-        # Execute query
-        results = []
+    def query_knowledge_graph_many(self, questions: List[str]) -> List[List[Tuple[str, str, str]]]:
+        """
+        Answer a batch of questions in one network round trip. The name
+        lookup syncs on its own thread and never adds a query here.
+        :return: One list of (subject, predicate, object) triples per question
+        """
+        results = [[] for _ in questions]
+        if not questions:
+            return results
 
-        with self.driver.session() as session:
-            result = session.run(
-                query, 
-                subject=query_elements['subject'] if query_elements['subject'] else ''
-            )
-            for record in result:
-                triple = (record["subject"], record["predicate"], record["object"])
-                results.append(triple)
+        elements_list = self.process_questions(questions)
+        if self.lookup is not None:
+            self.lookup.start(self.manager)
+        with self.session() as session:
+            query, rows = self.generate_neo4j_query(elements_list)
+            for record in session.run(query, rows=rows):
+                results[record["idx"]].append(
+                    (record["subject"], record["predicate"], record["object"]))
 
-        self.driver.close()
         return results
@@ -0,0 +1,61 @@
+import logging
+import os
+import threading
+import spacy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.environ.get("SPACY_MODEL", "en_core_web_sm")
+# Components the triple extractor and question parser never read. The
+# tagger, attribute_ruler (pos_) and parser (dep_, sents, noun_chunks) stay.
+EXCLUDED_COMPONENTS = tuple(
+    name.strip() for name in os.environ.get("SPACY_EXCLUDE", "ner,lemmatizer").split(",")
+    if name.strip()
+)
+
+
+class NlpPipelineRegistry:
+    """
+    Process-wide cache of loaded spaCy pipelines, keyed by (model name,
+    excluded components). Excluded components are not loaded at all.
+    """
+
+    def __init__(self, exclude=EXCLUDED_COMPONENTS):
+        self.exclude = tuple(exclude)
+        self._pipelines = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name=DEFAULT_MODEL, exclude=None):
+        """
+        Returns the pipeline, loading it on first use.
+        :param model_name: spaCy model name or path
+        :param exclude: Components to leave out, defaults to the registry's
+        :return: Loaded spacy.Language
+        """
+        key = (model_name, tuple(self.exclude if exclude is None else exclude))
+        with self._lock:
+            nlp = self._pipelines.get(key)
+            if nlp is None:
+                logger.info(f"Loading spaCy model {model_name} without {', '.join(key[1]) or 'nothing'}")
+                nlp = spacy.load(model_name, exclude=list(key[1]))
+                self._pipelines[key] = nlp
+            return nlp
+
+    def preload(self, model_names):
+        """
+        Loads the given models ahead of the first task.
+        :param model_names: Iterable of model names
+        """
+        for model_name in model_names:
+            self.get(model_name)
+
+    def loaded(self):
+        with self._lock:
+            return list(self._pipelines.keys())
+
+
+registry = NlpPipelineRegistry()
+
+
+def get_nlp(model_name=DEFAULT_MODEL):
+    return registry.get(model_name)
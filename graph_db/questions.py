@@ -0,0 +1,58 @@
+from typing import List
+from nlp_pipelines import get_nlp
+
+# Relationship types a treatment question follows
+TREATMENT_PREDICATES = ('treats', 'used_for')
+
+
+def parse_questions(questions: List[str]) -> List[dict]:
+    """
+    Parse all questions in a single nlp.pipe pass into query elements.
+    """
+    nlp = get_nlp()
+    return [query_elements(doc) for doc in nlp.pipe(question.lower() for question in questions)]
+
+
+def query_elements(doc) -> dict:
+    """
+    Identify the key elements of a parsed question for querying.
+    """
+    elements = {
+        'focus': None,      # Main topic of question (e.g., "treatments")
+        'subject': None,    # Subject of interest (e.g., "diabetes")
+        'constraints': [],  # Additional constraints (e.g., "latest", "type 2")
+        'question_type': None  # What, How, Who, etc.
+    }
+
+    # Identify question type
+    for token in doc:
+        if token.tag_ == "WDT" or token.tag_ == "WP" or token.tag_ == "WRB":
+            elements['question_type'] = token.text
+            break
+
+    # Find main focus and subject
+    for chunk in doc.noun_chunks:
+        if not elements['subject'] and any(word in chunk.text for word in ['diabetes', 'disease', 'condition']):
+            elements['subject'] = chunk.text
+        elif not elements['focus'] and any(word in chunk.text for word in ['treatment', 'therapy', 'medication']):
+            elements['focus'] = chunk.text
+
+    # Identify constraints
+    for token in doc:
+        if token.pos_ == "ADJ":
+            elements['constraints'].append(token.text)
+
+    return elements
+
+
+def question_filter(idx: int, elements: dict) -> dict:
+    """
+    The filter a question applies to the graph, shared by every backend.
+    """
+    return {
+        "idx": idx,
+        "subject": elements['subject'] or '',
+        # Treatment questions only follow treats/used_for relationships
+        "treatment": 'treatment' in (elements['focus'] or ''),
+        "latest": 'latest' in elements['constraints'],
+    }
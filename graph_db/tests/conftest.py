@@ -0,0 +1,21 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+# Service modules import each other as top-level modules, and main.py
+# imports gaia.utils from the repository root
+GRAPH_DB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [GRAPH_DB_DIR, os.path.dirname(GRAPH_DB_DIR)]
+
+
+@pytest.fixture(scope="session")
+def graph_main():
+    # Loaded by path: other services' tests also put a main.py on sys.path
+    spec = importlib.util.spec_from_file_location("graph_db_main", os.path.join(GRAPH_DB_DIR, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    # Registered so pool processes can unpickle its functions
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,105 @@
+import pytest
+
+pytest.importorskip("neo4j")
+pytest.importorskip("rdflib_neo4j")
+
+import neo4j_input
+from neo4j_input import EntityNameLookup, Neo4jTripleImporter
+
+
+class Result(list):
+    def single(self):
+        return self[0]
+
+
+class FakeSession:
+    """
+    Answers the lookup's queries from a list of (name, created).
+    """
+
+    def __init__(self, entities, now=10000):
+        self.entities = entities
+        self.now = now
+        self.queries = []
+
+    def run(self, query, since=None, after=None, limit=None):
+        if "timestamp()" in query:
+            self.queries.append("now")
+            return Result([{"now": self.now}])
+        if after is not None:
+            self.queries.append(("page", after))
+            names = sorted(name for name, _ in self.entities if name > after)
+            return Result({"name": name} for name in names[:limit])
+        self.queries.append(("since", since))
+        return Result({"name": name, "created": created} for name, created in self.entities
+                      if created >= since)
+
+
+def test_unloaded_lookup_defers_to_fulltext():
+    lookup = EntityNameLookup()
+    lookup.add(["type 2 diabetes"])
+    assert lookup.resolve("diabetes") is None
+
+
+def test_load_pages_through_every_name():
+    session = FakeSession([("type 2 diabetes", 100), ("insulin", 200), ("gestational diabetes", 300)])
+    lookup = EntityNameLookup()
+    lookup.load(session, page_size=2)
+
+    assert session.queries == ["now", ("page", ""), ("page", "insulin")]
+    assert lookup.complete
+    assert lookup.resolve("diabetes") == ["gestational diabetes", "type 2 diabetes"]
+    assert lookup.created_since == 10000
+
+
+def test_late_committed_entities_are_fetched(monkeypatch):
+    monkeypatch.setattr(neo4j_input, "ENTITY_LOOKUP_OVERLAP_MS", 1000)
+    session = FakeSession([("insulin", 5000)], now=5000)
+    lookup = EntityNameLookup()
+    lookup.sync(session)
+
+    # A transaction that started earlier commits after the first sync
+    session.entities.append(("gestational diabetes", 4500))
+    lookup.sync(session)
+
+    assert session.queries[-1] == ("since", 4000)
+    assert lookup.resolve("diabetes") == ["gestational diabetes"]
+
+
+def test_full_resync_catches_entities_older_than_the_overlap(monkeypatch):
+    monkeypatch.setattr(neo4j_input, "ENTITY_LOOKUP_OVERLAP_MS", 1000)
+    session = FakeSession([("insulin", 5000)], now=5000)
+    lookup = EntityNameLookup()
+    lookup.sync(session)
+
+    session.entities.append(("gestational diabetes", 1000))
+    lookup.sync(session)
+    assert lookup.resolve("diabetes") == []
+
+    monkeypatch.setattr(neo4j_input, "ENTITY_LOOKUP_FULL_RESYNC", 0)
+    lookup.sync(session)
+    assert ("page", "") in session.queries[-3:]
+    assert lookup.resolve("diabetes") == ["gestational diabetes"]
+
+
+def test_oversized_graphs_disable_the_lookup(monkeypatch):
+    monkeypatch.setattr(neo4j_input, "ENTITY_LOOKUP_MAX_NAMES", 2)
+    lookup = EntityNameLookup()
+    lookup.load(FakeSession([("a", 1), ("b", 2), ("c", 3)]), page_size=2)
+
+    assert lookup.disabled
+    assert lookup.names == []
+    assert lookup.resolve("a") is None
+
+
+def test_rows_resolve_through_a_loaded_lookup():
+    lookup = EntityNameLookup()
+    importer = Neo4jTripleImporter(manager=object(), lookup=lookup)
+    elements = [{"subject": "diabetes", "focus": None, "constraints": []},
+                {"subject": "asthma", "focus": None, "constraints": []}]
+    assert [row["mode"] for row in importer.generate_neo4j_query(elements)[1]] == ["fulltext"] * 2
+
+    lookup.load(FakeSession([("type 2 diabetes", 100)]))
+    rows = importer.generate_neo4j_query(elements)[1]
+    assert rows[0]["mode"] == "names" and rows[0]["names"] == ["type 2 diabetes"]
+    assert rows[1]["mode"] == "fulltext"
@@ -0,0 +1,80 @@
+import pytest
+
+spacy = pytest.importorskip("spacy")
+pytest.importorskip("neo4j")
+pytest.importorskip("rdflib_neo4j")
+
+
+class RecordingNlp:
+    """
+    Stand-in for a spaCy Language that checks nlp.pipe's as_tuples contract.
+    """
+
+    def __init__(self):
+        self.blank = spacy.blank("en")
+        self.seen = []
+
+    def pipe(self, pairs, as_tuples=False, batch_size=None, n_process=1):
+        assert as_tuples
+        for text, context in pairs:
+            assert isinstance(text, str), f"nlp.pipe got {text!r} as the text"
+            self.seen.append((text, context))
+            yield self.blank(text), context
+
+
+@pytest.fixture
+def main(graph_main):
+    return graph_main
+
+
+@pytest.fixture
+def nlp(main, monkeypatch):
+    recording = RecordingNlp()
+    monkeypatch.setattr(main, "get_nlp", lambda: recording)
+    # One triple per Doc, so chunk ids can be checked without a parser
+    monkeypatch.setattr(main, "doc_triples", lambda doc: [(doc.text, "in", "chunk")])
+    return recording
+
+
+def test_plain_chunks_use_their_position_as_chunk_id(main, nlp):
+    results = list(main.extract_triples(["alpha text", "beta text"], n_process=1))
+
+    assert nlp.seen == [("alpha text", 0), ("beta text", 1)]
+    assert results == [(0, ("alpha text", "in", "chunk")), (1, ("beta text", "in", "chunk"))]
+
+
+def test_chunk_id_pairs_keep_their_ids(main, nlp):
+    results = list(main.extract_triples([("c7", "alpha text"), ("c9", "beta text")], n_process=1))
+
+    assert nlp.seen == [("alpha text", "c7"), ("beta text", "c9")]
+    assert [chunk_id for chunk_id, _ in results] == ["c7", "c9"]
+
+
+def test_json_list_pairs_keep_their_ids(main, nlp):
+    results = list(main.extract_triples([["c7", "alpha text"], ["c9", "beta text"]], n_process=1))
+
+    assert nlp.seen == [("alpha text", "c7"), ("beta text", "c9")]
+    assert [chunk_id for chunk_id, _ in results] == ["c7", "c9"]
+
+
+def test_parsing_pool_keeps_chunk_order(main, monkeypatch):
+    blank = spacy.blank("en")
+    monkeypatch.setattr(main, "get_nlp", lambda: blank)
+    monkeypatch.setattr(main, "doc_triples", lambda doc: [(doc.text, "in", "chunk")])
+    chunks = [f"text {i}" for i in range(50)] + [["last", "final text"]]
+    try:
+        results = list(main.extract_triples(chunks, batch_size=4, n_process=2))
+    finally:
+        main.shutdown_nlp_pool()
+
+    assert results == [(i, (f"text {i}", "in", "chunk")) for i in range(50)] + \
+        [("last", ("final text", "in", "chunk"))]
+
+
+def test_blank_pipeline_accepts_the_pairs(main, monkeypatch):
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    monkeypatch.setattr(main, "get_nlp", lambda: nlp)
+
+    assert list(main.extract_triples(["Thorin seeks the Arkenstone.", ("c1", "Bilbo joins.")],
+                                     n_process=1)) == []
@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("spacy")
+
+from memory_graph import InMemoryKnowledgeGraph
+from questions import question_filter
+
+TRIPLES = [
+    ("metformin", "treats", "type 2 diabetes"),
+    ("insulin", "used_for", "type 1 diabetes"),
+    ("type 2 diabetes", "causes", "neuropathy"),
+    ("obesity", "risk_factor", "type 2 diabetes"),
+    ("lisinopril", "treats", "hypertension"),
+]
+
+
+@pytest.fixture
+def graph():
+    graph = InMemoryKnowledgeGraph()
+    graph.import_triples(iter(TRIPLES))
+    return graph
+
+
+def row(subject=None, focus=None):
+    return question_filter(0, {"subject": subject, "focus": focus, "constraints": []})
+
+
+def test_import_skips_duplicates(graph):
+    assert graph.import_triples([TRIPLES[0], ("metformin", "treats", "prediabetes")]) == 1
+    assert len(graph) == len(TRIPLES) + 1
+
+
+def test_subject_matches_edges_in_both_directions(graph):
+    assert graph._answer(row("type 2 diabetes"), limit=10) == [TRIPLES[0], TRIPLES[2], TRIPLES[3]]
+    assert graph._answer(row("diabetes"), limit=10) == TRIPLES[:4]
+    assert graph._answer(row("diabetes"), limit=2) == TRIPLES[:2]
+
+
+def test_treatment_questions_follow_treatment_predicates(graph):
+    # The subject is the source entity of the treatment edges
+    assert graph._answer(row("metformin", "treatment"), limit=10) == [TRIPLES[0]]
+    assert graph._answer(row(None, "treatment"), limit=10) == [TRIPLES[0], TRIPLES[1], TRIPLES[4]]
+
+
+def test_no_subject_returns_the_first_edges(graph):
+    assert graph._answer(row(), limit=3) == TRIPLES[:3]
+
+
+def test_adjacency_is_rebuilt_after_imports(graph):
+    graph._answer(row("neuropathy"), limit=10)
+    graph.import_triples([("neuropathy", "treated_by", "pregabalin")])
+    assert graph._answer(row("neuropathy"), limit=10) == [TRIPLES[2], ("neuropathy", "treated_by", "pregabalin")]
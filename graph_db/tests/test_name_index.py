@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from name_index import TrigramIndex
+
+NAMES = ["Type 2 Diabetes", "type 1 diabetes", "Gestational diabetes", "Insulin",
+         "Metformin", "Diabetic neuropathy", "Hypertension", "Mi", "Dia"]
+
+
+@pytest.fixture
+def index():
+    index = TrigramIndex()
+    for entity_id, name in enumerate(NAMES):
+        index.add(entity_id, name)
+    return index
+
+
+def scan(substring):
+    return [i for i, name in enumerate(NAMES) if substring.lower() in name.lower()]
+
+
+@pytest.mark.parametrize("substring", ["diabetes", "DIAB", "betes", "2 dia", "tin", "xyz", "etes d"])
+def test_search_matches_a_scan(index, substring):
+    assert index.search(substring) == scan(substring)
+
+
+@pytest.mark.parametrize("substring", ["mi", "i", "", "Di"])
+def test_short_substrings_fall_back_to_a_scan(index, substring):
+    assert index.search(substring) == scan(substring)
+
+
+def test_trigrams_out_of_order_are_not_matches():
+    index = TrigramIndex()
+    # Holds every trigram of "abcab" without the substring
+    index.add(0, "abcxbca cab")
+    assert index.search("abcab") == []
+
+
+def test_search_limit_keeps_id_order(index):
+    assert index.search("diabet", limit=2) == [0, 1]
+    assert index.search("diabet", limit=0) == scan("diabet")
+
+
+def test_prefix_is_in_name_order(index):
+    assert index.prefix("dia") == [8, 5]
+    assert index.prefix("TYPE", limit=1) == [1]
+    assert index.prefix("zz") == []
+
+    index.add(20, "Diabetes insipidus")
+    assert index.prefix("dia") == [8, 20, 5]
+
+
+def test_duplicate_ids_are_ignored(index):
+    index.add(3, "Renamed")
+    assert len(index) == len(NAMES)
+    assert index.search("insulin") == [3]
+
+
+def test_large_index_matches_a_scan():
+    rng = random.Random(0)
+    words = ["acid", "beta", "cell", "diabetes", "gene", "heart", "insulin", "kidney"]
+    names = [" ".join(rng.choice(words) for _ in range(3)) for _ in range(3000)]
+    index = TrigramIndex()
+    for entity_id, name in enumerate(names):
+        index.add(entity_id, name)
+
+    for substring in ("insulin kid", "beta cell", "etes gene", "acid acid acid"):
+        assert index.search(substring) == [i for i, name in enumerate(names) if substring in name]
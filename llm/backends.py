@@ -0,0 +1,179 @@
+from pathlib import Path
+import logging
+import os
+import torch
+from transformers import AutoTokenizer, AutoModelForQuestionAnswering
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = os.environ.get('MODEL_PATH', '/app/models')
+# "torch" (fp32), "int8" (dynamic quantization of Linear layers) or "onnx"
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "torch")
+LLM_ONNX_OPSET = int(os.environ.get("LLM_ONNX_OPSET", 17))
+# onnxruntime intra-op threads, 0 lets it pick one per physical core
+LLM_ONNX_THREADS = int(os.environ.get("LLM_ONNX_THREADS", 0))
+
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def default_device():
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def local_model_dir(model_name):
+    return Path(MODEL_PATH) / model_name.split('/')[-1]
+
+
+def load_qa_model(model_name, device=None):
+    """
+    Load a tokenizer and question-answering model, from MODEL_PATH when it
+    was saved there before, otherwise from Hugging Face (saving a copy).
+    The model is moved to the device and put in eval mode.
+    """
+    model_dir = local_model_dir(model_name)
+    if (model_dir / 'config.json').exists():
+        logger.info(f"Loading model from local path: {model_dir}")
+        tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        model = AutoModelForQuestionAnswering.from_pretrained(str(model_dir))
+    else:
+        logger.info(f"Downloading {model_name} from Hugging Face")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForQuestionAnswering.from_pretrained(model_name)
+        try:
+            model_dir.mkdir(parents=True, exist_ok=True)
+            tokenizer.save_pretrained(str(model_dir))
+            model.save_pretrained(str(model_dir))
+            logger.info(f"Saved model to {model_dir}")
+        except OSError as e:
+            logger.warning(f"Could not save model to {model_dir}: {e}")
+
+    device = device or default_device()
+    model = model.to(device)
+    model.eval()
+    logger.info(f"Model {model_name} ready on {device}")
+    return tokenizer, model
+
+
+def load_int8_model(model_name):
+    """
+    fp32 model with its Linear layers dynamically quantized to int8
+    (weights stored as int8, activations quantized per batch). CPU only.
+    Quantizing takes seconds, so nothing is cached on disk.
+    """
+    tokenizer, model = load_qa_model(model_name, device="cpu")
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    model.eval()
+    logger.info(f"Model {model_name} quantized to int8")
+    return tokenizer, model
+
+
+class QAOutputs:
+    def __init__(self, start_logits, end_logits):
+        self.start_logits = start_logits
+        self.end_logits = end_logits
+
+
+class _QALogits(torch.nn.Module):
+    # Positional inputs in, (start_logits, end_logits) out, for export
+    def __init__(self, model, input_names):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+
+    def forward(self, *inputs):
+        outputs = self.model(**dict(zip(self.input_names, inputs)), return_dict=True)
+        return outputs.start_logits, outputs.end_logits
+
+
+class OnnxQAModel:
+    """
+    onnxruntime session behind the subset of the transformers model
+    interface the QA code uses: .device and model(**inputs) returning
+    start_logits and end_logits tensors.
+    """
+    device = torch.device("cpu")
+
+    def __init__(self, session, path):
+        self.session = session
+        self.path = path
+        self.input_names = [node.name for node in session.get_inputs()]
+
+    def __call__(self, **inputs):
+        feed = {name: inputs[name].cpu().numpy() for name in self.input_names}
+        start_logits, end_logits = self.session.run(["start_logits", "end_logits"], feed)
+        return QAOutputs(torch.from_numpy(start_logits), torch.from_numpy(end_logits))
+
+    def memory_bytes(self):
+        return os.path.getsize(self.path)
+
+
+def export_onnx(model, tokenizer, path, opset=LLM_ONNX_OPSET):
+    """
+    Export a QA model to ONNX with dynamic batch and sequence axes.
+    Written to a temporary file first, since workers share MODEL_PATH.
+    """
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids")
+                   if name in tokenizer.model_input_names]
+    sample = tokenizer("Who?", "Someone.", return_tensors="pt")
+    axes = {name: {0: "batch", 1: "sequence"}
+            for name in input_names + ["start_logits", "end_logits"]}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with torch.no_grad():
+        torch.onnx.export(_QALogits(model, input_names), tuple(sample[name] for name in input_names),
+                          str(partial), input_names=input_names,
+                          output_names=["start_logits", "end_logits"], dynamic_axes=axes,
+                          opset_version=opset, do_constant_folding=True)
+    os.replace(partial, path)
+    logger.info(f"Exported ONNX model to {path}")
+
+
+def load_onnx_model(model_name):
+    """
+    ONNX export of the model run by onnxruntime on CPU. The export and the
+    graph-optimized copy are cached under MODEL_PATH/<model>/onnx.
+    """
+    import onnxruntime as ort
+
+    onnx_dir = local_model_dir(model_name) / "onnx"
+    exported = onnx_dir / "model.onnx"
+    optimized = onnx_dir / "model.optimized.onnx"
+    if exported.exists() or optimized.exists():
+        tokenizer = AutoTokenizer.from_pretrained(str(local_model_dir(model_name)))
+    else:
+        tokenizer, model = load_qa_model(model_name, device="cpu")
+        export_onnx(model, tokenizer, exported)
+        del model
+
+    if not optimized.exists():
+        # Offline pass: only hardware-independent rewrites are saved
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+        options.optimized_model_filepath = str(optimized.with_name(f"{optimized.name}.{os.getpid()}.tmp"))
+        ort.InferenceSession(str(exported), options, providers=["CPUExecutionProvider"])
+        os.replace(options.optimized_model_filepath, optimized)
+        logger.info(f"Saved optimized ONNX graph to {optimized}")
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = LLM_ONNX_THREADS
+    session = ort.InferenceSession(str(optimized), options, providers=["CPUExecutionProvider"])
+    logger.info(f"Model {model_name} ready on onnxruntime")
+    return tokenizer, OnnxQAModel(session, optimized)
+
+
+LOADERS = {
+    "torch": load_qa_model,
+    "int8": load_int8_model,
+    "onnx": load_onnx_model,
+}
+
+
+def load_model(model_name, backend=LLM_BACKEND):
+    """
+    Load a QA model with the given inference backend.
+    :return: (tokenizer, model)
+    """
+    if backend not in LOADERS:
+        raise ValueError(f"Unknown LLM backend {backend!r}, expected one of {BACKENDS}")
+    return LOADERS[backend](model_name)
@@ -0,0 +1,150 @@
+from collections import OrderedDict
+import logging
+import os
+import queue
+import threading
+import time
+from model_registry import registry as model_registry
+from qa_inference import answer
+
+logger = logging.getLogger(__name__)
+
+# How long the first request of a batch waits for others to join it
+LLM_BATCH_MAX_WAIT_MS = float(os.environ.get("LLM_BATCH_MAX_WAIT_MS", 10))
+# Questions answered together at most, summed over the batched requests
+LLM_BATCH_MAX_ITEMS = int(os.environ.get("LLM_BATCH_MAX_ITEMS", 64))
+
+
+class QARequest:
+    """
+    One task's questions waiting for the batcher.
+    """
+
+    def __init__(self, model_name, questions, context):
+        self.model_name = model_name
+        self.questions = list(questions)
+        self.context = context
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.answers = None
+        self.error = None
+        self.timing = None
+
+
+class MicroBatcher:
+    """
+    Collects QA requests from concurrent tasks in this process and answers
+    them together.
+
+    Task threads submit a request and block on it. A single inference
+    thread takes the oldest request, waits up to max_wait_ms for more to
+    arrive (or until max_items questions are pending), answers all of them
+    per model in one batched call, and hands every task its own answers.
+    Each request records how long it waited in the queue and how long the
+    batch took to compute.
+    """
+
+    def __init__(self, max_wait_ms=LLM_BATCH_MAX_WAIT_MS, max_items=LLM_BATCH_MAX_ITEMS,
+                 registry=model_registry):
+        self.max_wait = max_wait_ms / 1000
+        self.max_items = max_items
+        self.registry = registry
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "questions": 0, "batches": 0,
+                      "queue_wait_seconds": 0.0, "compute_seconds": 0.0}
+
+    def _ensure_thread(self):
+        with self._lock:
+            # A forked child inherits the object but not the thread
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, model_name, questions, context):
+        """
+        Answer questions against context, batched with concurrent requests.
+        :return: (answers, timing) where timing holds queueWaitMs, computeMs,
+                 batchRequests and batchQuestions
+        """
+        request = QARequest(model_name, questions, context)
+        if not request.questions:
+            return [], None
+        self._ensure_thread()
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.answers, request.timing
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        items = len(batch[0].questions)
+        deadline = batch[0].enqueued + self.max_wait
+        while items < self.max_items:
+            remaining = deadline - time.monotonic()
+            try:
+                # Past the deadline, still take whatever is already queued
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            items += len(request.questions)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups = OrderedDict()
+            for request in batch:
+                groups.setdefault(request.model_name, []).append(request)
+            for model_name, requests in groups.items():
+                self._answer(model_name, requests)
+
+    def _answer(self, model_name, requests):
+        started = time.monotonic()
+        questions = [question for request in requests for question in request.questions]
+        contexts = [request.context for request in requests for _ in request.questions]
+        try:
+            tokenizer, model = self.registry.get(model_name)
+            answers = answer(tokenizer, model, questions, contexts)
+        except Exception as e:
+            if len(requests) > 1:
+                # Retry one by one so a bad request only fails its own task
+                for request in requests:
+                    self._answer(model_name, [request])
+                return
+            requests[0].error = e
+            requests[0].done.set()
+            return
+        compute = time.monotonic() - started
+
+        offset = 0
+        waits = []
+        for request in requests:
+            request.answers = answers[offset:offset + len(request.questions)]
+            offset += len(request.questions)
+            waits.append(started - request.enqueued)
+            request.timing = {
+                "queueWaitMs": round(waits[-1] * 1000, 2),
+                "computeMs": round(compute * 1000, 2),
+                "batchRequests": len(requests),
+                "batchQuestions": len(questions),
+            }
+            request.done.set()
+
+        self.stats["requests"] += len(requests)
+        self.stats["questions"] += len(questions)
+        self.stats["batches"] += 1
+        self.stats["queue_wait_seconds"] += sum(waits)
+        self.stats["compute_seconds"] += compute
+        logger.info(f"Batch of {len(requests)} requests ({len(questions)} questions) on {model_name}: "
+                    f"queue wait max {max(waits) * 1000:.1f} ms, compute {compute * 1000:.1f} ms")
+
+
+batcher = MicroBatcher()
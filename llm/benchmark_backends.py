@@ -0,0 +1,113 @@
+# benchmark_backends.py
+#
+# Compares the CPU inference backends of the llm worker on one QA model:
+# single-question latency, batched throughput and how often each backend
+# gives the same answer as fp32 PyTorch. Run from the llm directory:
+#
+#   python benchmark_backends.py --model distilbert-base-uncased-distilled-squad --questions 64
+
+import argparse
+import json
+import statistics
+import time
+from collections import Counter
+
+import torch
+
+from backends import BACKENDS, load_model
+from qa_inference import answer
+
+CONTEXT = (
+    "Thorin Ironfist, the exiled king of the dwarves of the Grey Mountains, "
+    "set out from the town of Bree in the autumn of 2941 to reclaim the Arkenstone, "
+    "a jewel stolen by the dragon Smaug. He was joined by twelve companions and a "
+    "hobbit named Bilbo Baggins, who had been hired as a burglar. The company crossed "
+    "the Misty Mountains, where goblins captured them, and later passed through "
+    "Mirkwood, an ancient forest ruled by the elvenking Thranduil. In Lake-town the "
+    "master of the town gave them boats and food. The dragon was killed by Bard the "
+    "Bowman with a black arrow, and after the Battle of Five Armies the Arkenstone "
+    "was laid upon the tomb of Thorin beneath the mountain."
+)
+
+QUESTIONS = [
+    "What is the main quest of Thorin Ironfist?",
+    "Who stole the Arkenstone?",
+    "Where did Thorin set out from?",
+    "Who was hired as a burglar?",
+    "Who killed the dragon?",
+    "Who ruled Mirkwood?",
+    "What did the master of Lake-town give them?",
+    "Where was the Arkenstone laid?",
+]
+
+
+def token_f1(prediction, reference):
+    prediction, reference = prediction.lower().split(), reference.lower().split()
+    common = sum((Counter(prediction) & Counter(reference)).values())
+    if not prediction or not reference:
+        return float(prediction == reference)
+    if common == 0:
+        return 0.0
+    precision, recall = common / len(prediction), common / len(reference)
+    return 2 * precision * recall / (precision + recall)
+
+
+def bench_backend(model_name, backend, questions, context, batch_size, runs):
+    started = time.perf_counter()
+    tokenizer, model = load_model(model_name, backend)
+    load_seconds = time.perf_counter() - started
+
+    # Warm up allocator and kernels
+    answer(tokenizer, model, questions[:batch_size], context)
+
+    latencies = []
+    for _ in range(runs):
+        for question in questions[:len(QUESTIONS)]:
+            started = time.perf_counter()
+            answer(tokenizer, model, [question], context)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    answers = []
+    for start in range(0, len(questions), batch_size):
+        answers.extend(answer(tokenizer, model, questions[start:start + batch_size], context))
+    batch_seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return answers, {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "latency_ms_p50": 1000 * statistics.median(latencies),
+        "latency_ms_p95": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+        "questions_per_second": len(questions) / batch_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="distilbert-base-uncased-distilled-squad")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--questions", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads, 0 keeps the default")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.questions)]
+
+    reference = None
+    for backend in args.backends:
+        answers, result = bench_backend(args.model, backend, questions, CONTEXT,
+                                        args.batch_size, args.runs)
+        if reference is None:
+            reference = answers
+            result["reference"] = True
+        result["exact_agreement"] = sum(a == b for a, b in zip(answers, reference)) / len(answers)
+        result["token_f1_agreement"] = statistics.mean(token_f1(a, b) for a, b in zip(answers, reference))
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,25 @@
 import time
 import torch
-from transformers import AutoTokenizer, AutoModelForQuestionAnswering
-import json
 import psutil
-import os
-from pathlib import Path
 import logging
+from model_registry import registry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 MODEL_NAME = "nlpaueb/legal-bert-base-uncased"
-MODEL_PATH = os.environ.get('MODEL_PATH', '/app/models')
 tokenizer = None
 model = None
 
 def initialize_model():
-    """Initialize the model and tokenizer once"""
+    """Fetch the model and tokenizer from the process-wide registry"""
     global tokenizer, model
-    if tokenizer is None or model is None:
-        try:
-            logger.info(f"Initializing model {MODEL_NAME}")
-            
-            # Create model directory if it doesn't exist
-            model_dir = Path(MODEL_PATH) / MODEL_NAME.split('/')[-1]
-            model_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Check if model exists locally
-            if (model_dir / 'config.json').exists():
-                logger.info(f"Loading model from local path: {model_dir}")
-                tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
-                model = AutoModelForQuestionAnswering.from_pretrained(str(model_dir))
-            else:
-                logger.info(f"Downloading model from Hugging Face")
-                tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-                model = AutoModelForQuestionAnswering.from_pretrained(MODEL_NAME)
-                
-                # Save model locally
-                logger.info(f"Saving model to {model_dir}")
-                tokenizer.save_pretrained(str(model_dir))
-                model.save_pretrained(str(model_dir))
-            
-            if torch.cuda.is_available():
-                model = model.cuda()
-                logger.info("Model moved to GPU")
-            else:
-                logger.info("Running on CPU")
-                
-            logger.info("Model initialization completed successfully")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error initializing model: {str(e)}")
-            return False
-    return True
+    try:
+        tokenizer, model = registry.get(MODEL_NAME)
+        return True
+    except Exception as e:
+        logger.error(f"Error initializing model: {str(e)}")
+        return False
 
 def process_legal_query(context, question):
     """
@@ -70,8 +36,7 @@ def process_legal_query(context, question):
     try:
         inputs = tokenizer(question, context, return_tensors="pt", truncation=True)
         
-        if torch.cuda.is_available():
-            inputs = {k: v.cuda() for k, v in inputs.items()}
+        inputs = inputs.to(model.device)
 
         start_time = time.time()
         with torch.no_grad():
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+import logging
+import os
+import threading
+import torch
+from backends import LLM_BACKEND, load_model
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LLM = os.environ.get("DEFAULT_LLM", "bert-base-uncased")
+# Weight memory the resident models may use together
+LLM_MEMORY_BUDGET_MB = int(os.environ.get("LLM_MEMORY_BUDGET_MB", 2048))
+
+
+def _tensors(value):
+    if isinstance(value, torch.Tensor):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _tensors(item)
+
+
+def model_bytes(model):
+    """
+    Memory held by a model's weights. Uses the state dict, which also
+    covers the packed weights of int8-quantized layers.
+    """
+    if hasattr(model, "memory_bytes"):
+        return model.memory_bytes()
+    return sum(tensor.numel() * tensor.element_size()
+               for value in model.state_dict().values() for tensor in _tensors(value))
+
+
+class QAModelRegistry:
+    """
+    Per-process cache of loaded (tokenizer, model) pairs keyed by model
+    name and inference backend. Models stay resident between tasks; once
+    their combined size exceeds the memory budget, the least recently used
+    ones are evicted.
+    A model larger than the whole budget is still kept while it is the only
+    one loaded.
+    """
+
+    def __init__(self, memory_budget_mb=LLM_MEMORY_BUDGET_MB, loader=load_model):
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.loader = loader
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name=DEFAULT_LLM, backend=LLM_BACKEND):
+        """
+        Returns the model, loading it on first use.
+        :param model_name: Hugging Face model name or path
+        :param backend: "torch", "int8" or "onnx"
+        :return: (tokenizer, model)
+        """
+        key = (model_name, backend)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                return entry
+
+            entry = self.loader(model_name, backend)
+            self._models[key] = entry
+            self._sizes[key] = model_bytes(entry[1])
+            logger.info(f"Loaded {model_name} on {backend} ({self._sizes[key] / 2**20:.0f} MB), "
+                        f"{self.resident_bytes() / 2**20:.0f} MB resident")
+            self._evict(keep=key)
+            return entry
+
+    def _evict(self, keep):
+        while self.resident_bytes() > self.memory_budget and len(self._models) > 1:
+            evicted = next(key for key in self._models if key != keep)
+            del self._models[evicted]
+            freed = self._sizes.pop(evicted)
+            logger.info(f"Evicted model {evicted} ({freed / 2**20:.0f} MB)")
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def resident_bytes(self):
+        return sum(self._sizes.values())
+
+    def preload(self, model_names, backend=LLM_BACKEND):
+        """
+        Loads the given models ahead of the first task.
+        :param model_names: Iterable of model names
+        """
+        for model_name in model_names:
+            self.get(model_name, backend)
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models.keys())
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._sizes.clear()
+
+
+registry = QAModelRegistry()
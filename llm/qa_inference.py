@@ -0,0 +1,204 @@
+from itertools import islice
+import logging
+import os
+import torch
+
+logger = logging.getLogger(__name__)
+
+# (question, context) pairs per forward pass
+LLM_BATCH_SIZE = int(os.environ.get("LLM_BATCH_SIZE", 16))
+LLM_MAX_LENGTH = int(os.environ.get("LLM_MAX_LENGTH", 512))
+# "window" answers over the whole context with overlapping windows,
+# "truncate" only looks at the first LLM_MAX_LENGTH tokens
+LLM_QA_MODE = os.environ.get("LLM_QA_MODE", "window")
+# Context tokens shared by consecutive windows
+LLM_DOC_STRIDE = int(os.environ.get("LLM_DOC_STRIDE", 128))
+LLM_MAX_ANSWER_TOKENS = int(os.environ.get("LLM_MAX_ANSWER_TOKENS", 30))
+LLM_MAX_QUESTION_TOKENS = int(os.environ.get("LLM_MAX_QUESTION_TOKENS", 64))
+
+
+def span_bounds(start_logits, end_logits, attention_mask):
+    """
+    Argmax start and end token per row, ignoring padding positions.
+    :return: (starts, ends) as Python lists
+    """
+    padding = attention_mask == 0
+    starts = start_logits.masked_fill(padding, float("-inf")).argmax(dim=-1)
+    ends = end_logits.masked_fill(padding, float("-inf")).argmax(dim=-1)
+    return starts.tolist(), ends.tolist()
+
+
+def answer_questions(tokenizer, model, questions, contexts,
+                     batch_size=LLM_BATCH_SIZE, max_length=LLM_MAX_LENGTH):
+    """
+    Answer every question against its context, truncated to max_length.
+
+    All pairs are tokenized in one call without padding, then grouped by
+    length into micro-batches that are padded only to their own longest
+    sequence, so one no-grad forward pass covers batch_size questions.
+    :param questions: List of question strings
+    :param contexts: Context text of each question
+    :return: One answer string per question, in question order
+    """
+    if not questions:
+        return []
+    encodings = tokenizer(list(questions), list(contexts),
+                          truncation=True, max_length=max_length)
+    input_ids = encodings["input_ids"]
+    # Similar lengths together keep per-batch padding small
+    order = sorted(range(len(questions)), key=lambda i: len(input_ids[i]))
+
+    answers = [None] * len(questions)
+    for offset in range(0, len(order), batch_size):
+        rows = order[offset:offset + batch_size]
+        batch = tokenizer.pad({key: [encodings[key][i] for i in rows] for key in encodings.keys()},
+                              return_tensors="pt").to(model.device)
+        with torch.no_grad():
+            outputs = model(**batch)
+        starts, ends = span_bounds(outputs.start_logits, outputs.end_logits, batch["attention_mask"])
+        spans = [input_ids[i][start:end + 1] for i, start, end in zip(rows, starts, ends)]
+        for i, answer in zip(rows, tokenizer.batch_decode(spans)):
+            answers[i] = answer
+    logger.debug(f"Answered {len(questions)} questions in batches of {batch_size}")
+    return answers
+
+
+def best_spans(start_logits, end_logits, context_mask, max_answer_tokens=LLM_MAX_ANSWER_TOKENS):
+    """
+    Highest start + end scoring span per row, restricted to context tokens
+    and to spans of at most max_answer_tokens tokens.
+    :param context_mask: Bool tensor, True where a token belongs to the context
+    :return: (scores, starts, ends) as Python lists
+    """
+    start_logits = start_logits.masked_fill(~context_mask, float("-inf"))
+    end_logits = end_logits.masked_fill(~context_mask, float("-inf"))
+    length = start_logits.shape[1]
+    # band[i, j]: i <= j < i + max_answer_tokens
+    band = torch.ones(length, length, dtype=torch.bool, device=start_logits.device)
+    band = band.triu().tril(max_answer_tokens - 1)
+    scores = (start_logits[:, :, None] + end_logits[:, None, :]).masked_fill(~band, float("-inf"))
+    best, index = scores.flatten(1).max(dim=1)
+    return best.tolist(), (index // length).tolist(), (index % length).tolist()
+
+
+class WindowTemplate:
+    """
+    Special-token layout of one question paired with a context window,
+    taken from the tokenizer itself so it works for any QA model.
+    """
+
+    def __init__(self, tokenizer, question_ids):
+        # A -1 placeholder marks where the context goes
+        probe = tokenizer.build_inputs_with_special_tokens(question_ids, [-1])
+        self.context_start = probe.index(-1)
+        self.prefix = probe[:self.context_start]
+        self.suffix = probe[self.context_start + 1:]
+        self.token_types = None
+        if "token_type_ids" in tokenizer.model_input_names:
+            types = tokenizer.create_token_type_ids_from_sequences(question_ids, [-1])
+            self.token_types = (types[:self.context_start], types[self.context_start],
+                                types[self.context_start + 1:])
+
+    def overhead(self):
+        # Question and special tokens around the context window
+        return len(self.prefix) + len(self.suffix)
+
+    def encode(self, window_ids):
+        encoded = {"input_ids": self.prefix + window_ids + self.suffix}
+        if self.token_types is not None:
+            prefix, context, suffix = self.token_types
+            encoded["token_type_ids"] = prefix + [context] * len(window_ids) + suffix
+        return encoded
+
+
+def context_windows(context_length, window_length, stride):
+    """
+    Start offsets of overlapping windows covering the whole context.
+    """
+    step = max(window_length - stride, 1)
+    start = 0
+    while True:
+        yield start
+        if start + window_length >= context_length:
+            break
+        start += step
+
+
+def answer_questions_long(tokenizer, model, questions, contexts,
+                          batch_size=LLM_BATCH_SIZE, max_length=LLM_MAX_LENGTH,
+                          stride=LLM_DOC_STRIDE, max_answer_tokens=LLM_MAX_ANSWER_TOKENS):
+    """
+    Answer every question against its whole context, however long.
+
+    Each distinct context is tokenized once and cut into windows of max_length
+    tokens (question and special tokens included) that overlap by stride
+    tokens. Windows of all questions are streamed through the model in
+    micro-batches of batch_size and only the best span seen so far is kept
+    per question, so memory does not grow with the context length.
+    :param questions: List of question strings
+    :param contexts: Context text of each question
+    :param stride: Context tokens shared by consecutive windows
+    :param max_answer_tokens: Longest answer span considered, in tokens
+    :return: One answer string per question, in question order
+    """
+    if not questions:
+        return []
+    tokenized = {}
+    for context in contexts:
+        if context not in tokenized:
+            tokenized[context] = tokenizer(context, add_special_tokens=False, verbose=False)["input_ids"]
+    context_ids = [tokenized[context] for context in contexts]
+    question_ids = tokenizer(list(questions), add_special_tokens=False, truncation=True,
+                             max_length=LLM_MAX_QUESTION_TOKENS)["input_ids"]
+    templates = [WindowTemplate(tokenizer, ids) for ids in question_ids]
+
+    def windows():
+        for question, template in enumerate(templates):
+            window_length = max_length - template.overhead()
+            ids = context_ids[question]
+            for start in context_windows(len(ids), window_length, stride):
+                yield question, start, ids[start:start + window_length]
+
+    best = [(float("-inf"), 0, -1) for _ in questions]
+    pending = windows()
+    batches = 0
+    while True:
+        batch_windows = list(islice(pending, batch_size))
+        if not batch_windows:
+            break
+        batch = tokenizer.pad([templates[question].encode(window_ids)
+                               for question, _, window_ids in batch_windows],
+                              return_tensors="pt").to(model.device)
+        offsets = torch.tensor([templates[question].context_start
+                                for question, _, _ in batch_windows], device=model.device)
+        lengths = torch.tensor([len(window_ids) for _, _, window_ids in batch_windows],
+                               device=model.device)
+        positions = torch.arange(batch["input_ids"].shape[1], device=model.device)
+        context_mask = (positions >= offsets[:, None]) & (positions < (offsets + lengths)[:, None])
+        with torch.no_grad():
+            outputs = model(**batch)
+        scores, starts, ends = best_spans(outputs.start_logits, outputs.end_logits,
+                                          context_mask, max_answer_tokens)
+
+        for (question, window_start, _), offset, score, start, end in zip(
+                batch_windows, offsets.tolist(), scores, starts, ends):
+            if score > best[question][0]:
+                # Keep the span as context token positions
+                best[question] = (score, window_start + start - offset, window_start + end - offset)
+        batches += 1
+
+    logger.debug(f"Answered {len(questions)} questions over {len(tokenized)} contexts "
+                 f"in {batches} batches")
+    return tokenizer.batch_decode([ids[start:end + 1] for ids, (_, start, end) in zip(context_ids, best)])
+
+
+def answer(tokenizer, model, questions, contexts, mode=LLM_QA_MODE):
+    """
+    Answer questions with the configured QA mode.
+    :param contexts: One context per question, or a single context for all
+    """
+    if isinstance(contexts, str):
+        contexts = [contexts] * len(questions)
+    if mode == "truncate":
+        return answer_questions(tokenizer, model, questions, contexts)
+    return answer_questions_long(tokenizer, model, questions, contexts)
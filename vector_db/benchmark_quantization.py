@@ -0,0 +1,102 @@
+# benchmark_quantization.py
+#
+# Compares the storage modes of the vector index on a synthetic corpus:
+# resident bytes per vector, compression ratio, recall@k against exact
+# float32 search and queries per second. Modes that re-rank need the float
+# rows, so they run on a PersistentVectorIndex in a temporary directory, the
+# way VECTOR_DB_PATH deployments hold them. Run from the vector_db directory:
+#
+#   python benchmark_quantization.py --vectors 100000 --dimension 384 --k 10
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from storage import PersistentVectorIndex
+from vector_index import VectorIndex, normalize, top_k_rows
+
+
+def synthetic_corpus(count, dimension, clusters, seed=0):
+    """
+    Clustered unit vectors, closer to real embeddings than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    members = rng.integers(0, clusters, size=count)
+    vectors = centers[members] + 0.6 * rng.normal(size=(count, dimension)).astype(np.float32)
+    return normalize(vectors)
+
+
+def bench_mode(vectors, queries, truth, k, quantization, pq_m, rerank, batch_size):
+    if quantization and rerank > 1:
+        with tempfile.TemporaryDirectory() as path:
+            index = PersistentVectorIndex(path, vectors.shape[1], quantization=quantization,
+                                          pq_m=pq_m, rerank=rerank)
+            return _bench_index(index, "disk", vectors, queries, truth, k, batch_size)
+    index = VectorIndex(vectors.shape[1], capacity=len(vectors),
+                        quantization=quantization, pq_m=pq_m, rerank=rerank)
+    return _bench_index(index, "memory", vectors, queries, truth, k, batch_size)
+
+
+def _bench_index(index, storage, vectors, queries, truth, k, batch_size):
+    quantization = index.quantization
+    started = time.perf_counter()
+    index.insert(vectors)
+    if quantization and not index.quantized:
+        index.train_quantizer()
+    build_seconds = time.perf_counter() - started
+
+    found = []
+    started = time.perf_counter()
+    for start in range(0, len(queries), batch_size):
+        found.extend(ids for ids, _ in index.search_many(queries[start:start + batch_size], k=k))
+    search_seconds = time.perf_counter() - started
+
+    hits = sum(len(np.intersect1d(ids, expected)) for ids, expected in zip(found, truth))
+    # Everything the index holds in process memory, ids and bookkeeping included
+    resident = index.resident_bytes() / len(vectors)
+    mapped = sum(array.nbytes for array in (index.vectors, index.codes, index.ids)
+                 if isinstance(array, np.memmap)) / len(vectors)
+    # Every search scans the codes, so mapped codes stay in the page cache;
+    # mapped float rows are only paged in for re-ranked candidates
+    scanned = index.codes.nbytes / len(vectors) if isinstance(index.codes, np.memmap) else 0
+    float32_resident = vectors.shape[1] * 4 + 8 + 1 + 4
+    return {
+        "mode": quantization or "float32",
+        "rerank": index.rerank if quantization else None,
+        "storage": storage,
+        "resident_bytes_per_vector": resident,
+        "mapped_bytes_per_vector": mapped,
+        "compression": float32_resident / (resident + scanned),
+        f"recall@{k}": hits / (len(queries) * k),
+        "qps": len(queries) / search_seconds,
+        "build_seconds": build_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    vectors = synthetic_corpus(args.vectors + args.queries, args.dimension, args.clusters)
+    vectors, queries = vectors[:args.vectors], vectors[args.vectors:]
+    truth, _ = top_k_rows(queries @ vectors.T, args.k)
+
+    modes = [(None, 1), ("int8", 1), ("int8", 4), ("pq", 1), ("pq", 4)]
+    for quantization, rerank in modes:
+        print(json.dumps(bench_mode(vectors, queries, truth, args.k, quantization,
+                                    args.pq_m, rerank, args.batch_size)))
+
+
+if __name__ == "__main__":
+    main()
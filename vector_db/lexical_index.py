@@ -0,0 +1,122 @@
+from collections import Counter
+import logging
+import math
+import re
+import threading
+import numpy as np
+from vector_index import top_k
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it
+its of on or she that the their them they this to was were what when where
+which who will with you your
+""".split())
+
+
+def tokenize(text):
+    """
+    Lowercased alphanumeric terms without stopwords.
+    """
+    return [term for term in TOKEN_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over the chunk texts of one collection,
+    addressed by the row numbers of its VectorIndex.
+
+    Postings use a CSR layout instead of per-term Python lists: the rows
+    containing term t are postings_rows[offsets[t]:offsets[t + 1]] (int32)
+    with their term frequencies in postings_freqs (uint16). Added rows are
+    buffered and merged into the arrays before the next search. Deleted rows
+    are not removed from the postings; searches take the vector index's live
+    mask instead.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, row_epoch=None):
+        self.row_epoch = row_epoch
+        self.rows = 0
+        self.vocabulary = {}
+        self.doc_lengths = np.empty(0, dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings_rows = np.empty(0, dtype=np.int32)
+        self.postings_freqs = np.empty(0, dtype=np.uint16)
+        self._pending_terms = []
+        self._pending_rows = []
+        self._pending_freqs = []
+        self._pending_lengths = []
+
+    def add(self, texts):
+        """
+        Indexes texts as the next rows; None indexes an empty row.
+        """
+        with self.lock:
+            for text in texts:
+                counts = Counter(tokenize(text)) if text else {}
+                for term, freq in counts.items():
+                    self._pending_terms.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                    self._pending_rows.append(self.rows)
+                    self._pending_freqs.append(min(freq, 65535))
+                self._pending_lengths.append(sum(counts.values()))
+                self.rows += 1
+
+    def _merge(self):
+        if not self._pending_lengths:
+            return
+        old_terms = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int32),
+                              np.diff(self.offsets))
+        terms = np.concatenate([old_terms, np.asarray(self._pending_terms, dtype=np.int32)])
+        rows = np.concatenate([self.postings_rows, np.asarray(self._pending_rows, dtype=np.int32)])
+        freqs = np.concatenate([self.postings_freqs, np.asarray(self._pending_freqs, dtype=np.uint16)])
+        # Stable, so each term's postings stay in row order
+        order = np.argsort(terms, kind="stable")
+        self.postings_rows = rows[order]
+        self.postings_freqs = freqs[order]
+        counts = np.bincount(terms, minlength=len(self.vocabulary))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.doc_lengths = np.concatenate([self.doc_lengths,
+                                           np.asarray(self._pending_lengths, dtype=np.float32)])
+        self._pending_terms, self._pending_rows = [], []
+        self._pending_freqs, self._pending_lengths = [], []
+
+    def search(self, query, k=10, live=None):
+        """
+        Ranks rows by BM25 score for a query.
+        :param query: Query text
+        :param k: Number of results
+        :param live: Optional boolean mask of rows that may be returned
+        :return: (rows, scores) arrays, best first
+        """
+        with self.lock:
+            self._merge()
+            terms = {self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary}
+            if not terms or self.rows == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+            live = np.ones(self.rows, dtype=bool) if live is None else np.asarray(live[:self.rows])
+            documents = int(live.sum())
+            average_length = max(float(self.doc_lengths[live].mean()) if documents else 1.0, 1e-6)
+
+            scores = np.zeros(self.rows, dtype=np.float32)
+            for term in terms:
+                start, stop = self.offsets[term], self.offsets[term + 1]
+                rows = self.postings_rows[start:stop]
+                freqs = self.postings_freqs[start:stop].astype(np.float32)
+                frequency = stop - start
+                idf = math.log(1 + (documents - frequency + 0.5) / (frequency + 0.5))
+                # A term's postings hold each row once, so += cannot collide
+                norms = self.k1 * (1 - self.b + self.b * self.doc_lengths[rows] / average_length)
+                scores[rows] += idf * freqs * (self.k1 + 1) / (freqs + norms)
+
+            candidates = np.flatnonzero((scores > 0) & live)
+            best = candidates[top_k(scores[candidates], k)]
+            return best, scores[best]
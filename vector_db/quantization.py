@@ -0,0 +1,197 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per block, bounds the float32 temporaries of a scan
+SCORE_BLOCK_ROWS = 65536
+
+
+def kmeans(vectors, n_clusters, iterations=20, seed=0):
+    """
+    Euclidean k-means.
+    :return: (n_clusters, dimension) array of centroids
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    vector_norms = (vectors ** 2).sum(axis=1)
+    for _ in range(iterations):
+        distances = vector_norms[:, None] - 2 * vectors @ centroids.T + (centroids ** 2).sum(axis=1)
+        assignments = np.argmin(distances, axis=1)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        # Per-cluster sums over contiguous runs of the sorted points
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.zeros_like(centroids)
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(vectors[order], starts[filled], axis=0)
+        # Reseed empty clusters from random points
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+            counts[empty] = 1
+        centroids = (sums / counts[:, None]).astype(np.float32)
+    return centroids
+
+
+class ScalarQuantizer:
+    """
+    int8 scalar quantization: every dimension is mapped linearly onto 256
+    levels between the minimum and maximum seen in training, so a vector
+    takes one byte per dimension instead of four.
+
+    Queries stay in float32 (asymmetric scoring):
+        q . x ~= q . low + (q * step) . code
+    """
+    kind = "int8"
+
+    def __init__(self, dimension):
+        self.dimension = dimension
+        self.low = None
+        self.step = None
+
+    @property
+    def code_size(self):
+        return self.dimension
+
+    def fit(self, vectors):
+        self.low = vectors.min(axis=0).astype(np.float32)
+        high = vectors.max(axis=0).astype(np.float32)
+        self.step = np.maximum(high - self.low, 1e-8) / 255.0
+        return self
+
+    def encode(self, vectors):
+        levels = np.rint((np.asarray(vectors, dtype=np.float32) - self.low) / self.step)
+        return np.clip(levels, 0, 255).astype(np.uint8)
+
+    def decode(self, codes):
+        return self.low + codes.astype(np.float32) * self.step
+
+    def score(self, queries, codes):
+        """
+        Approximate inner products of float queries with encoded rows.
+        :return: (queries, rows) float32 array
+        """
+        offsets = queries @ self.low
+        scaled = (queries * self.step).astype(np.float32)
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = np.asarray(codes[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[:, start:start + len(block)] = scaled @ block.T
+        return scores + offsets[:, None]
+
+    def to_arrays(self):
+        return {"low": self.low, "step": self.step}
+
+    @classmethod
+    def from_arrays(cls, dimension, arrays):
+        quantizer = cls(dimension)
+        quantizer.low = arrays["low"].astype(np.float32)
+        quantizer.step = arrays["step"].astype(np.float32)
+        return quantizer
+
+
+class ProductQuantizer:
+    """
+    Product quantization: the vector is split into m sub-vectors and each is
+    replaced by the index of its nearest of 256 sub-centroids, so a vector
+    takes m bytes.
+
+    Scoring uses asymmetric distance tables: for each query the inner
+    product of every query sub-vector with every sub-centroid is computed
+    once, and a row's score is the sum of m table lookups.
+    """
+    kind = "pq"
+
+    def __init__(self, dimension, m=8, ksub=256):
+        if dimension % m:
+            raise ValueError(f"PQ sub-quantizers ({m}) must divide the dimension ({dimension})")
+        self.dimension = dimension
+        self.m = m
+        self.ksub = ksub
+        self.dsub = dimension // m
+        self.codebooks = None
+
+    @property
+    def code_size(self):
+        return self.m
+
+    def _split(self, vectors):
+        return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), self.m, self.dsub)
+
+    def fit(self, vectors, iterations=20):
+        parts = self._split(vectors)
+        ksub = min(self.ksub, len(vectors))
+        self.codebooks = np.stack([kmeans(parts[:, j], ksub, iterations, seed=j)
+                                   for j in range(self.m)])
+        return self
+
+    def encode(self, vectors):
+        parts = self._split(vectors)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codebook = self.codebooks[j]
+            distances = (codebook ** 2).sum(axis=1) - 2 * parts[:, j] @ codebook.T
+            codes[:, j] = np.argmin(distances, axis=1)
+        return codes
+
+    def decode(self, codes):
+        return np.concatenate([self.codebooks[j][codes[:, j]] for j in range(self.m)], axis=1)
+
+    def distance_tables(self, queries):
+        """
+        :return: (queries, m, ksub) inner products of query sub-vectors with
+            the sub-centroids
+        """
+        return np.einsum("qjd,jkd->qjk", self._split(queries), self.codebooks)
+
+    def score(self, queries, codes):
+        """
+        Approximate inner products of float queries with encoded rows.
+        :return: (queries, rows) float32 array
+        """
+        # (m, queries, ksub) so each sub-quantizer's table is contiguous
+        tables = np.ascontiguousarray(self.distance_tables(queries).transpose(1, 0, 2),
+                                      dtype=np.float32)
+        scores = np.zeros((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = np.ascontiguousarray(np.asarray(codes[start:start + SCORE_BLOCK_ROWS]).T)
+            target = scores[:, start:start + block.shape[1]]
+            for j in range(self.m):
+                target += np.take(tables[j], block[j], axis=1)
+        return scores
+
+    def to_arrays(self):
+        return {"codebooks": self.codebooks}
+
+    @classmethod
+    def from_arrays(cls, dimension, arrays):
+        codebooks = arrays["codebooks"].astype(np.float32)
+        quantizer = cls(dimension, m=codebooks.shape[0], ksub=codebooks.shape[1])
+        quantizer.codebooks = codebooks
+        return quantizer
+
+
+QUANTIZERS = {
+    "int8": ScalarQuantizer,
+    "pq": ProductQuantizer,
+}
+
+
+def make_quantizer(kind, dimension, pq_m=8):
+    """
+    :param kind: "int8" or "pq"
+    :param dimension: Vector dimension
+    :param pq_m: Number of PQ sub-quantizers
+    """
+    if kind == "int8":
+        return ScalarQuantizer(dimension)
+    if kind == "pq":
+        return ProductQuantizer(dimension, m=pq_m)
+    raise ValueError(f"Unknown quantization: {kind}")
+
+
+def load_quantizer(kind, dimension, arrays):
+    if kind not in QUANTIZERS:
+        raise ValueError(f"Unknown quantization: {kind}")
+    return QUANTIZERS[kind].from_arrays(dimension, arrays)
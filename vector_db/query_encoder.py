@@ -0,0 +1,34 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Must match the chunker's model for query and chunk vectors to be comparable
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "paraphrase-MiniLM-L6-v2")
+QUERY_BATCH_SIZE = int(os.environ.get("QUERY_BATCH_SIZE", 64))
+
+_models = {}
+_lock = threading.Lock()
+
+
+def get_encoder(model_name=EMBEDDING_MODEL):
+    """
+    Returns the query embedding model, loaded once per worker process.
+    """
+    with _lock:
+        if model_name not in _models:
+            from sentence_transformers import SentenceTransformer
+            logger.info(f"Loading query embedding model {model_name}")
+            _models[model_name] = SentenceTransformer(model_name)
+        return _models[model_name]
+
+
+def encode_queries(queries, model_name=EMBEDDING_MODEL):
+    """
+    Embeds all queries in one batched encode call.
+    :return: float32 array with a row per query
+    """
+    model = get_encoder(model_name)
+    return model.encode(list(queries), batch_size=QUERY_BATCH_SIZE,
+                        convert_to_numpy=True)
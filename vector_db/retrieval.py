@@ -0,0 +1,107 @@
+import logging
+import os
+import numpy as np
+from lexical_index import TOKEN_PATTERN
+
+logger = logging.getLogger(__name__)
+
+RRF_K = int(os.environ.get("RAG_RRF_K", 60))
+RAG_TOKEN_BUDGET = int(os.environ.get("RAG_TOKEN_BUDGET", 512))
+# Share of a chunk's word trigrams already in the context for it to count as a duplicate
+RAG_DEDUP_OVERLAP = float(os.environ.get("RAG_DEDUP_OVERLAP", 0.8))
+
+
+def sync_lexical_index(lexical, index):
+    """
+    Brings a BM25 index up to date with the rows of a VectorIndex. Only
+    rows appended since the last sync are tokenized; the index is rebuilt
+    when the vector index has renumbered its rows.
+    """
+    with index.lock:
+        if lexical.row_epoch != index.row_epoch or lexical.rows > index.size:
+            lexical.reset(index.row_epoch)
+        if lexical.rows == index.size:
+            return lexical
+        texts = []
+        for row in range(lexical.rows, index.size):
+            vector_id = int(index.ids[row])
+            meta = index.metadata.get(vector_id) if index.id_to_row.get(vector_id) == row else None
+            texts.append(meta.get("text") if meta else None)
+        lexical.add(texts)
+    return lexical
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Fuses ranked id lists: score(id) = sum over lists of 1 / (k + rank).
+    :param rankings: Iterable of id sequences, best first
+    :return: List of (id, score), best first
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, vector_id in enumerate(ranking, start=1):
+            scores[vector_id] = scores.get(vector_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _shingles(words, size=3):
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def assemble_rag_text(chunks, token_budget=RAG_TOKEN_BUDGET, dedup_overlap=RAG_DEDUP_OVERLAP):
+    """
+    Concatenates ranked chunks into a context of at most token_budget tokens
+    (approximated by whitespace words). Chunks mostly covered by text already
+    selected, e.g. overlapping windows of the same passage, are skipped.
+    :param chunks: Chunk texts, best first
+    :return: (rag_text, indices of the chunks used)
+    """
+    selected, used, seen = [], [], set()
+    remaining = token_budget
+    for position, text in enumerate(chunks):
+        words = text.split()
+        if not words or len(words) > remaining:
+            continue
+        shingles = _shingles(TOKEN_PATTERN.findall(text.lower()))
+        if len(shingles & seen) >= dedup_overlap * len(shingles):
+            continue
+        seen |= shingles
+        selected.append(text.strip())
+        used.append(position)
+        remaining -= len(words)
+    return "\n\n".join(selected), used
+
+
+def hybrid_retrieve(index, lexical, queries, query_embeddings, k=5, depth=None,
+                    token_budget=RAG_TOKEN_BUDGET, nprobe=None):
+    """
+    Retrieves chunks for the queries with both the dense index and BM25,
+    fuses all rankings with reciprocal rank fusion and assembles ragText.
+    :param index: VectorIndex whose metadata holds chunk texts
+    :param lexical: BM25Index kept in sync with the index
+    :param queries: Query texts
+    :param query_embeddings: (len(queries), dimension) array
+    :param k: Number of fused chunks to consider for the context
+    :param depth: Candidates taken from each ranking, defaults to 4 * k (at least 20)
+    :return: (rag_text, results) where results describes the chunks used
+    """
+    depth = depth or max(4 * k, 20)
+    # Dense search first: persistent indexes pick up other workers' writes there
+    rankings = [ids.tolist() for ids, _ in index.search_many(query_embeddings, k=depth, nprobe=nprobe)]
+    with index.lock:
+        sync_lexical_index(lexical, index)
+        live = np.asarray(index.live[:index.size])
+        for query in queries:
+            rows, _ = lexical.search(query, k=depth, live=live)
+            rankings.append(index.ids[rows].tolist())
+        fused = reciprocal_rank_fusion(rankings)[:k]
+        metadata = [index.metadata.get(int(vector_id), {}) for vector_id, _ in fused]
+
+    rag_text, used = assemble_rag_text([meta.get("text") or "" for meta in metadata], token_budget)
+    results = [{"id": int(fused[i][0]), "score": fused[i][1], **metadata[i]} for i in used]
+    logger.info(f"Hybrid retrieval fused {len(rankings)} rankings, "
+                f"kept {len(used)} of {len(fused)} chunks")
+    return rag_text, results
+
@@ -0,0 +1,406 @@
+from contextlib import contextmanager
+import fcntl
+import io
+import json
+import logging
+import os
+import shutil
+import numpy as np
+from quantization import load_quantizer
+from vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+FORMAT = "gaia-vector-index"
+FORMAT_VERSION = 1
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _append(path, committed_bytes, data):
+    """
+    Appends data after the committed part of a file, dropping anything an
+    interrupted write left behind.
+    """
+    with open(path, 'ab') as file:
+        file.truncate(committed_bytes)
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _write_file(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def _map(path, dtype, shape):
+    # Read-only mapping: every process on the host shares the page cache
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+
+class PersistentVectorIndex(VectorIndex):
+    """
+    VectorIndex stored in a versioned on-disk layout:
+
+        manifest.json              format version, settings, generation and
+                                   the committed row/delete/metadata counts
+        <generation>/vectors.f32   pre-normalised float32 rows
+        <generation>/ids.i64       id of each row
+        <generation>/metadata.jsonl  metadata of each row, one line per row
+        <generation>/deleted.i64   rows deleted since the generation was written
+        <generation>/centroids.f32, lists.i32  IVF quantizer, once trained
+        <generation>/quantizer.npz, codes.u8   int8/PQ quantizer and row codes,
+                                   once trained
+
+    Vector and id blocks are opened read-only with numpy.memmap, so worker
+    processes share one page-cached copy and opening is close to instant.
+    When quantized, searches scan the mapped codes and only the re-ranked
+    candidates' float rows are paged in.
+    Appends are written past the committed counts and only become visible
+    once manifest.json is atomically replaced; anything an interrupted write
+    leaves past those counts is ignored and later overwritten. Compaction
+    writes a new generation and switches to it the same way. Writers from
+    several processes are serialised with a file lock, and every operation
+    first picks up changes committed by other processes.
+    """
+
+    # Float rows stay on disk for re-ranking and compaction
+    stores_vectors = True
+
+    def __init__(self, path, dimension=None, mode="flat", nlist=64, nprobe=8,
+                 quantization=None, pq_m=8, rerank=4):
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.json")
+        os.makedirs(path, exist_ok=True)
+        self._lock_file = open(os.path.join(path, ".lock"), 'a')
+        self._lock_depth = 0
+        self._manifest_stat = None
+
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            manifest = self._read_manifest()
+            if manifest is None:
+                if not dimension:
+                    raise ValueError(f"No vector index at {path} and no dimension given")
+                manifest = {
+                    "format": FORMAT,
+                    "version": FORMAT_VERSION,
+                    "dimension": int(dimension),
+                    "mode": mode,
+                    "nlist": nlist,
+                    "nprobe": nprobe,
+                    "generation": 0,
+                    "count": 0,
+                    "deleted": 0,
+                    "metadata_bytes": 0,
+                    "trained": False,
+                    "quantization": quantization,
+                    "pq_m": pq_m,
+                    "rerank": rerank,
+                    "quantized": False,
+                    "next_id": 0,
+                }
+                os.makedirs(self._generation_dir(manifest), exist_ok=True)
+                self._write_manifest(manifest)
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+        if manifest.get("format") != FORMAT or manifest.get("version", 0) > FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector index format at {path}")
+        super().__init__(manifest["dimension"], mode=manifest["mode"],
+                         nlist=manifest["nlist"], nprobe=manifest["nprobe"], capacity=1,
+                         quantization=manifest.get("quantization"),
+                         pq_m=manifest.get("pq_m", 8), rerank=manifest.get("rerank", 4))
+        self._load(manifest)
+
+    def _generation_dir(self, manifest):
+        return os.path.join(self.path, str(manifest["generation"]))
+
+    def _file(self, name, manifest=None):
+        return os.path.join(self._generation_dir(manifest or self.manifest), name)
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as file:
+                stat = os.fstat(file.fileno())
+                manifest = json.load(file)
+        except FileNotFoundError:
+            return None
+        self._manifest_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        return manifest
+
+    def _write_manifest(self, manifest):
+        _write_file(self.manifest_path, json.dumps(manifest).encode('utf-8'))
+        _fsync_dir(self.path)
+        stat = os.stat(self.manifest_path)
+        self._manifest_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read_rows(self, name, dtype, start, stop, manifest):
+        with open(self._file(name, manifest), 'rb') as file:
+            file.seek(start * np.dtype(dtype).itemsize)
+            return np.frombuffer(file.read((stop - start) * np.dtype(dtype).itemsize), dtype=dtype)
+
+    def _read_metadata(self, start_bytes, stop_bytes, manifest):
+        with open(self._file("metadata.jsonl", manifest), 'rb') as file:
+            file.seek(start_bytes)
+            return [json.loads(line) for line in file.read(stop_bytes - start_bytes).splitlines()]
+
+    def _map_rows(self, manifest):
+        count = manifest["count"]
+        self.vectors = _map(self._file("vectors.f32", manifest), np.float32, (count, self.dimension))
+        self.ids = _map(self._file("ids.i64", manifest), np.int64, (count,))
+        if self.quantizer is not None:
+            self.codes = _map(self._file("codes.u8", manifest), np.uint8,
+                              (count, self.quantizer.code_size))
+
+    def _load(self, manifest):
+        """
+        Opens the committed state of a generation.
+        """
+        count = manifest["count"]
+        self.manifest = dict(manifest)
+        self.row_epoch += 1
+        self.quantizer = None
+        self.codes = None
+        if manifest.get("quantized"):
+            with np.load(self._file("quantizer.npz", manifest)) as arrays:
+                self.quantizer = load_quantizer(manifest["quantization"], self.dimension, arrays)
+        self._map_rows(manifest)
+        self.size = count
+        self.live = np.ones(count, dtype=bool)
+        self.next_id = manifest["next_id"]
+        self.nlist = manifest["nlist"]
+
+        if manifest["trained"]:
+            self.centroids = np.fromfile(self._file("centroids.f32", manifest),
+                                         dtype=np.float32).reshape(self.nlist, self.dimension)
+            self.assignments = self._read_rows("lists.i32", np.int32, 0, count, manifest).copy()
+        else:
+            self.centroids = None
+            self.assignments = np.zeros(count, dtype=np.int32)
+        self._list_offsets = None
+
+        # Later rows win for replaced ids; their old rows are in deleted.i64
+        self.id_to_row = dict(zip(self.ids.tolist(), range(count)))
+        self.metadata = {}
+        if count:
+            lines = self._read_metadata(0, manifest["metadata_bytes"], manifest)
+            for vector_id, meta in zip(self.ids.tolist(), lines):
+                if meta is not None:
+                    self.metadata[vector_id] = meta
+        self._apply_deletes(0, manifest["deleted"], manifest)
+
+    def _apply_deletes(self, start, stop, manifest):
+        if stop <= start:
+            return
+        rows = self._read_rows("deleted.i64", np.int64, start, stop, manifest)
+        self.live[rows] = False
+        for row in rows.tolist():
+            vector_id = int(self.ids[row])
+            if self.id_to_row.get(vector_id) == row:
+                del self.id_to_row[vector_id]
+                self.metadata.pop(vector_id, None)
+
+    def refresh(self):
+        """
+        Picks up changes committed by other processes.
+        """
+        with self.lock:
+            try:
+                stat = os.stat(self.manifest_path)
+            except FileNotFoundError:
+                return
+            if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self._manifest_stat:
+                return
+            manifest = self._read_manifest()
+            current = self.manifest
+            if manifest == current:
+                return
+            if (manifest["generation"] != current["generation"]
+                    or manifest["trained"] != current["trained"]
+                    or manifest.get("quantized") != current.get("quantized")
+                    or manifest["count"] < current["count"]):
+                self._load(manifest)
+                return
+
+            # Same generation: only read the appended tail
+            old_count, count = current["count"], manifest["count"]
+            if count > old_count:
+                self._map_rows(manifest)
+                new_ids = self.ids[old_count:count].tolist()
+                lines = self._read_metadata(current["metadata_bytes"],
+                                            manifest["metadata_bytes"], manifest)
+                self.live = np.concatenate([self.live, np.ones(count - old_count, dtype=bool)])
+                if manifest["trained"]:
+                    self.assignments = np.concatenate([
+                        self.assignments,
+                        self._read_rows("lists.i32", np.int32, old_count, count, manifest)])
+                    self._list_offsets = None
+                else:
+                    self.assignments = np.zeros(count, dtype=np.int32)
+                for offset, vector_id in enumerate(new_ids):
+                    self.id_to_row[vector_id] = old_count + offset
+                    if lines[offset] is not None:
+                        self.metadata[vector_id] = lines[offset]
+                    else:
+                        self.metadata.pop(vector_id, None)
+                self.size = count
+            self._apply_deletes(current["deleted"], manifest["deleted"], manifest)
+            self.next_id = manifest["next_id"]
+            self.manifest = dict(manifest)
+
+    @contextmanager
+    def _writing(self):
+        """
+        Holds the writer lock; changes staged in self._pending are committed
+        to the manifest when the outermost write finishes.
+        """
+        with self.lock:
+            if self._lock_depth == 0:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+                self.refresh()
+                self._pending = dict(self.manifest)
+            self._lock_depth += 1
+            try:
+                yield
+            except Exception:
+                if self._lock_depth == 1:
+                    # Discard uncommitted in-memory changes
+                    self._load(self._read_manifest())
+                raise
+            else:
+                if self._lock_depth == 1 and self._pending != self.manifest:
+                    self._pending["next_id"] = max(self._pending["next_id"], self.next_id)
+                    self._write_manifest(self._pending)
+                    self.manifest = dict(self._pending)
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _write_quantizer(self, manifest):
+        buffer = io.BytesIO()
+        np.savez(buffer, **self.quantizer.to_arrays())
+        _write_file(self._file("quantizer.npz", manifest), buffer.getvalue())
+
+    def _write_rows(self, vectors, ids, assignments, codes, metadata):
+        pending = self._pending
+        start, count = pending["count"], pending["count"] + len(ids)
+        row_bytes = self.dimension * 4
+        _append(self._file("vectors.f32", pending), start * row_bytes,
+                np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        _append(self._file("ids.i64", pending), start * 8, ids.tobytes())
+        if assignments is not None:
+            _append(self._file("lists.i32", pending), start * 4, assignments.tobytes())
+        if codes is not None:
+            code_size = self.quantizer.code_size
+            _append(self._file("codes.u8", pending), start * code_size, codes.tobytes())
+        lines = "".join(json.dumps(metadata[i] if metadata is not None else None) + "\n"
+                        for i in range(len(ids))).encode('utf-8')
+        _append(self._file("metadata.jsonl", pending), pending["metadata_bytes"], lines)
+
+        pending["count"] = count
+        pending["metadata_bytes"] += len(lines)
+        pending["next_id"] = max(pending["next_id"], int(ids.max()) + 1 if len(ids) else 0)
+
+        self._map_rows(pending)
+        self.live = np.concatenate([self.live[:start], np.ones(len(ids), dtype=bool)])
+        self.assignments = np.concatenate([
+            self.assignments[:start],
+            assignments if assignments is not None else np.zeros(len(ids), dtype=np.int32)])
+
+    def _write_deletes(self, rows):
+        pending = self._pending
+        _append(self._file("deleted.i64", pending), pending["deleted"] * 8,
+                np.asarray(rows, dtype=np.int64).tobytes())
+        pending["deleted"] += len(rows)
+
+    def insert(self, vectors, ids=None, metadata=None):
+        with self._writing():
+            return super().insert(vectors, ids=ids, metadata=metadata)
+
+    def delete(self, ids):
+        with self._writing():
+            return super().delete(ids)
+
+    def train(self, nlist=None, iterations=20, sample_size=None):
+        with self._writing():
+            super().train(nlist=nlist, iterations=iterations, sample_size=sample_size)
+            if not self.trained:
+                return
+            pending = self._pending
+            _write_file(self._file("centroids.f32", pending), self.centroids.astype(np.float32).tobytes())
+            _write_file(self._file("lists.i32", pending),
+                        self.assignments[:self.size].astype(np.int32).tobytes())
+            pending["trained"] = True
+            pending["nlist"] = self.nlist
+
+    def train_quantizer(self, sample_size=65536):
+        with self._writing():
+            super().train_quantizer(sample_size=sample_size)
+            if not self.quantized:
+                return
+            pending = self._pending
+            self._write_quantizer(pending)
+            _write_file(self._file("codes.u8", pending), self.codes[:self.size].tobytes())
+            pending["quantized"] = True
+            self._map_rows(pending)
+
+    def compact(self):
+        """
+        Writes the live rows to a new generation and switches to it.
+        """
+        with self._writing():
+            pending = self._pending
+            keep = np.flatnonzero(self.live[:self.size])
+            ids = np.asarray(self.ids[keep])
+            old_generation = pending["generation"]
+            pending["generation"] = old_generation + 1
+            os.makedirs(self._generation_dir(pending), exist_ok=True)
+
+            _write_file(self._file("vectors.f32", pending), np.asarray(self.vectors[keep]).tobytes())
+            _write_file(self._file("ids.i64", pending), ids.tobytes())
+            lines = "".join(json.dumps(self.metadata.get(vector_id)) + "\n"
+                            for vector_id in ids.tolist()).encode('utf-8')
+            _write_file(self._file("metadata.jsonl", pending), lines)
+            _write_file(self._file("deleted.i64", pending), b"")
+            if self.trained:
+                _write_file(self._file("centroids.f32", pending), self.centroids.astype(np.float32).tobytes())
+                _write_file(self._file("lists.i32", pending), self.assignments[keep].astype(np.int32).tobytes())
+            if self.quantized:
+                self._write_quantizer(pending)
+                _write_file(self._file("codes.u8", pending), np.asarray(self.codes[keep]).tobytes())
+            _fsync_dir(self._generation_dir(pending))
+
+            pending.update(count=len(keep), deleted=0, metadata_bytes=len(lines))
+            self._write_manifest(pending)
+            self._load(pending)
+            logger.info(f"Compacted {self.path} to generation {pending['generation']} "
+                        f"with {len(keep)} rows")
+
+            # Keep the previous generation for readers that are switching over
+            for name in os.listdir(self.path):
+                if name.isdigit() and int(name) < old_generation:
+                    shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def search(self, query, k=5, nprobe=None, rerank=None):
+        self.refresh()
+        return super().search(query, k=k, nprobe=nprobe, rerank=rerank)
+
+    def search_many(self, queries, k=5, nprobe=None, threshold=None, rerank=None):
+        self.refresh()
+        return super().search_many(queries, k=k, nprobe=nprobe, threshold=threshold,
+                                   rerank=rerank)
@@ -0,0 +1,123 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from lexical_index import BM25Index, tokenize
+from retrieval import assemble_rag_text, hybrid_retrieve, reciprocal_rank_fusion, sync_lexical_index
+from vector_index import VectorIndex, normalize
+
+TEXTS = [
+    "Thorin sought the Arkenstone beneath the Lonely Mountain.",
+    "The dragon Smaug guarded the Arkenstone and the gold.",
+    "Bilbo Baggins was hired as a burglar by the dwarves.",
+    "Bard the Bowman killed the dragon with a black arrow.",
+    "Thranduil ruled the elves of Mirkwood.",
+    None,
+    "Dragon dragon dragon: a long passage about a dragon and its hoard of gold and jewels.",
+]
+
+
+def reference_bm25(texts, query, live, k1=1.5, b=0.75):
+    # Scores every live row from scratch with the textbook formula
+    docs = [Counter(tokenize(text)) if text else Counter() for text in texts]
+    rows = [row for row in range(len(texts)) if live[row]]
+    average_length = sum(sum(docs[row].values()) for row in rows) / len(rows)
+    scores = {}
+    for row in rows:
+        length = sum(docs[row].values())
+        score = 0.0
+        for term in set(tokenize(query)):
+            # Document frequency counts every indexed row, like the postings do
+            frequency = sum(term in doc for doc in docs)
+            if not frequency:
+                continue
+            idf = math.log(1 + (len(rows) - frequency + 0.5) / (frequency + 0.5))
+            tf = docs[row][term]
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / average_length))
+        if score > 0:
+            scores[row] = score
+    return scores
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("The Dragon, and its GOLD!") == ["dragon", "gold"]
+
+
+@pytest.mark.parametrize("query", ["dragon", "Arkenstone gold", "dragon gold jewels", "Mirkwood"])
+def test_scores_match_reference(query):
+    index = BM25Index()
+    index.add(TEXTS)
+    live = np.ones(len(TEXTS), dtype=bool)
+    live[1] = False
+
+    rows, scores = index.search(query, k=len(TEXTS), live=live)
+    expected = reference_bm25(TEXTS, query, live)
+    assert sorted(rows.tolist()) == sorted(expected)
+    for row, score in zip(rows, scores):
+        assert score == pytest.approx(expected[row], rel=1e-5)
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_unknown_terms_and_empty_index_return_nothing():
+    index = BM25Index()
+    assert len(index.search("dragon")[0]) == 0
+    index.add(TEXTS)
+    assert len(index.search("hobbit")[0]) == 0
+    assert len(index.search("the and of")[0]) == 0
+
+
+def test_incremental_adds_match_a_single_add():
+    whole = BM25Index()
+    whole.add(TEXTS)
+    pieces = BM25Index()
+    pieces.add(TEXTS[:2])
+    pieces.search("dragon")
+    pieces.add(TEXTS[2:5])
+    pieces.add(TEXTS[5:])
+
+    for query in ("dragon", "Arkenstone", "dwarves burglar"):
+        expected_rows, expected_scores = whole.search(query, k=10)
+        rows, scores = pieces.search(query, k=10)
+        assert rows.tolist() == expected_rows.tolist()
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+
+def test_sync_follows_inserts_and_compaction():
+    index = VectorIndex(4)
+    vectors = normalize(np.random.default_rng(0).normal(size=(len(TEXTS), 4)))
+    index.insert(vectors, metadata=[{"text": text} if text else {} for text in TEXTS])
+    lexical = sync_lexical_index(BM25Index(), index)
+    assert lexical.rows == len(TEXTS)
+
+    index.delete(range(5))
+    sync_lexical_index(lexical, index)
+    assert lexical.row_epoch == index.row_epoch
+    assert lexical.rows == index.size == 2
+    rows, _ = lexical.search("dragon", live=index.live[:index.size])
+    assert index.ids[rows].tolist() == [6]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]], k=60)
+    assert [vector_id for vector_id, _ in fused] == [1, 3, 2, 4]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+
+
+def test_assemble_rag_text_skips_duplicates_and_respects_budget():
+    chunks = ["one two three four", "one two three four", "five six", "seven eight nine ten eleven"]
+    rag_text, used = assemble_rag_text(chunks, token_budget=8)
+    assert used == [0, 2]
+    assert rag_text == "one two three four\n\nfive six"
+
+
+def test_hybrid_retrieve_finds_lexical_matches():
+    index = VectorIndex(4)
+    rng = np.random.default_rng(1)
+    index.insert(rng.normal(size=(len(TEXTS), 4)), metadata=[{"text": text or ""} for text in TEXTS])
+
+    rag_text, results = hybrid_retrieve(index, BM25Index(), ["Who ruled Mirkwood?"],
+                                        rng.normal(size=(1, 4)), k=len(TEXTS))
+    assert "Thranduil ruled the elves of Mirkwood." in rag_text
+    assert results[0]["id"] == 4
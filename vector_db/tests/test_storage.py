@@ -0,0 +1,128 @@
+import os
+
+import numpy as np
+import pytest
+
+from storage import PersistentVectorIndex
+from vector_index import normalize
+
+DIMENSION = 16
+
+
+def random_vectors(count, seed=0):
+    return normalize(np.random.default_rng(seed).normal(size=(count, DIMENSION)))
+
+
+def nearest(index, vector, k=1):
+    ids, _ = index.search(vector, k=k)
+    return ids.tolist()
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "collection")
+
+
+def test_reopen_ignores_a_torn_append(path):
+    vectors = random_vectors(20)
+    index = PersistentVectorIndex(path, DIMENSION)
+    index.insert(vectors[:10], metadata=[{"text": f"row {i}"} for i in range(10)])
+
+    # An interrupted append leaves bytes past the committed counts
+    generation = os.path.join(path, str(index.manifest["generation"]))
+    for name, size in (("vectors.f32", DIMENSION * 4 * 3), ("ids.i64", 8 * 2),
+                       ("metadata.jsonl", 7)):
+        with open(os.path.join(generation, name), "ab") as file:
+            file.write(b"\xff" * size)
+
+    reopened = PersistentVectorIndex(path)
+    assert len(reopened) == 10
+    assert nearest(reopened, vectors[3]) == [3]
+
+    # The next append overwrites the torn tail
+    reopened.insert(vectors[10:], metadata=[{"text": f"row {i}"} for i in range(10, 20)])
+    again = PersistentVectorIndex(path)
+    assert len(again) == 20
+    assert nearest(again, vectors[15]) == [15]
+    assert again.metadata[15] == {"text": "row 15"}
+    assert again.metadata[4] == {"text": "row 4"}
+
+
+def test_handles_see_each_others_inserts_and_deletes(path):
+    vectors = random_vectors(30)
+    writer = PersistentVectorIndex(path, DIMENSION)
+    reader = PersistentVectorIndex(path)
+
+    writer.insert(vectors[:20], metadata=[{"n": i} for i in range(20)])
+    assert nearest(reader, vectors[7]) == [7]
+    assert reader.metadata[7] == {"n": 7}
+
+    reader.delete([7])
+    reader.insert(vectors[20:], ids=range(100, 110))
+    ids, _ = writer.search(vectors[7], k=30)
+    assert 7 not in ids.tolist()
+    assert nearest(writer, vectors[25]) == [105]
+    assert len(writer) == 29
+    assert writer.next_id == 110
+
+
+def test_compaction_while_another_handle_is_open(path):
+    vectors = random_vectors(100)
+    writer = PersistentVectorIndex(path, DIMENSION)
+    reader = PersistentVectorIndex(path)
+    writer.insert(vectors, metadata=[{"n": i} for i in range(100)])
+    assert len(reader.search_many(vectors[:5], k=3)) == 5
+
+    generation = writer.manifest["generation"]
+    # Deleting more than half of the rows compacts into a new generation
+    writer.delete(range(60))
+    assert writer.manifest["generation"] == generation + 1
+    assert writer.size == 40
+
+    results = reader.search_many(vectors[55:65], k=1)
+    found = [ids.tolist() for ids, _ in results]
+    assert all(ids[0] >= 60 for ids in found)
+    assert found[5:] == [[60], [61], [62], [63], [64]]
+    assert reader.metadata[70] == {"n": 70}
+    assert 10 not in reader.metadata
+
+    # Writes through the old handle land in the new generation
+    reader.insert(random_vectors(1, seed=1), ids=[500])
+    assert nearest(writer, random_vectors(1, seed=1)[0]) == [500]
+    assert len(PersistentVectorIndex(path)) == 41
+
+
+def test_quantized_collection_reopens_with_its_codes(path):
+    vectors = random_vectors(1500)
+    index = PersistentVectorIndex(path, DIMENSION, quantization="int8", rerank=4)
+    index.insert(vectors)
+    assert index.quantized
+
+    reopened = PersistentVectorIndex(path)
+    assert reopened.quantized
+    assert isinstance(reopened.codes, np.memmap)
+    assert nearest(reopened, vectors[42]) == [42]
+
+
+@pytest.mark.parametrize("options, min_recall", [
+    ({"mode": "flat"}, 1.0),
+    ({"mode": "ivf", "nlist": 8, "nprobe": 8}, 1.0),
+    ({"mode": "flat", "quantization": "int8", "rerank": 4}, 0.95),
+    ({"mode": "ivf", "nlist": 8, "nprobe": 8, "quantization": "pq", "pq_m": 4, "rerank": 8}, 0.9),
+])
+def test_search_many_matches_brute_force(path, options, min_recall):
+    vectors = random_vectors(2000)
+    queries = random_vectors(20, seed=2)
+    index = PersistentVectorIndex(path, DIMENSION, **options)
+    index.insert(vectors)
+    index.delete(range(0, 2000, 7))
+
+    reopened = PersistentVectorIndex(path)
+    live = np.array([i for i in range(2000) if i % 7])
+    expected = live[np.argsort(-(queries @ vectors[live].T), axis=1)[:, :10]]
+    results = reopened.search_many(queries, k=10)
+    recall = np.mean([len(set(ids.tolist()) & set(truth.tolist())) / 10
+                      for (ids, _), truth in zip(results, expected)])
+    assert recall >= min_recall
+    if min_recall == 1.0:
+        assert [ids.tolist() for ids, _ in results] == expected.tolist()
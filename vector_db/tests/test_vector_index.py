@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from vector_index import VectorIndex, normalize
+
+DIMENSION = 16
+
+
+def random_vectors(count, seed=0):
+    return normalize(np.random.default_rng(seed).normal(size=(count, DIMENSION)))
+
+
+def brute_force(vectors, live, queries, k):
+    return live[np.argsort(-(queries @ vectors[live].T), axis=1)[:, :k]]
+
+
+def test_insert_search_and_delete():
+    vectors = random_vectors(50)
+    index = VectorIndex(DIMENSION, capacity=4)
+    ids = index.insert(vectors, metadata=[{"n": i} for i in range(50)])
+
+    assert ids == list(range(50))
+    assert index.search(vectors[12], k=1)[0].tolist() == [12]
+    assert index.metadata[12] == {"n": 12}
+
+    index.delete([12])
+    assert 12 not in index.search(vectors[12], k=50)[0].tolist()
+    assert len(index) == 49
+
+
+def test_replacing_an_id_keeps_one_row():
+    vectors = random_vectors(10)
+    index = VectorIndex(DIMENSION)
+    index.insert(vectors[:5])
+    index.insert(vectors[5:6], ids=[2])
+
+    assert len(index) == 5
+    ids, scores = index.search(vectors[5], k=5)
+    assert ids.tolist()[0] == 2
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+    # The old row for id 2 is gone
+    assert index.search(vectors[2], k=1)[1][0] < 0.99
+
+
+def test_compaction_keeps_ids():
+    vectors = random_vectors(100)
+    index = VectorIndex(DIMENSION)
+    index.insert(vectors)
+    epoch = index.row_epoch
+    index.delete(range(60))
+
+    assert index.size == 40
+    assert index.row_epoch > epoch
+    assert index.search(vectors[70], k=1)[0].tolist() == [70]
+
+
+def test_search_matches_search_many():
+    vectors = random_vectors(300)
+    queries = random_vectors(5, seed=1)
+    index = VectorIndex(DIMENSION)
+    index.insert(vectors)
+
+    for query, (ids, scores) in zip(queries, index.search_many(queries, k=7)):
+        single_ids, single_scores = index.search(query, k=7)
+        assert ids.tolist() == single_ids.tolist()
+        np.testing.assert_allclose(scores, single_scores, rtol=1e-5)
+
+
+def test_threshold_drops_weak_matches():
+    vectors = random_vectors(100)
+    index = VectorIndex(DIMENSION)
+    index.insert(vectors)
+
+    ids, scores = index.search_many(vectors[:1], k=10, threshold=0.99)[0]
+    assert ids.tolist() == [0]
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+
+
+@pytest.mark.parametrize("options, min_recall", [
+    ({"mode": "flat"}, 1.0),
+    ({"mode": "ivf", "nlist": 8, "nprobe": 8}, 1.0),
+    ({"mode": "ivf", "nlist": 8, "nprobe": 2}, 0.5),
+    ({"mode": "flat", "quantization": "int8", "rerank": 1}, 0.85),
+    ({"mode": "flat", "quantization": "int8", "rerank": 4}, 0.95),
+    ({"mode": "ivf", "nlist": 8, "nprobe": 8, "quantization": "pq", "pq_m": 4, "rerank": 8}, 0.9),
+])
+def test_search_many_matches_brute_force(options, min_recall):
+    vectors = random_vectors(2000)
+    queries = random_vectors(20, seed=2)
+    index = VectorIndex(DIMENSION, **options)
+    index.insert(vectors)
+    index.delete(range(0, 2000, 7))
+    assert index.trained == (options["mode"] == "ivf")
+    assert index.quantized == ("quantization" in options)
+
+    live = np.array([i for i in range(2000) if i % 7])
+    expected = brute_force(vectors, live, queries, 10)
+    results = index.search_many(queries, k=10)
+    recall = np.mean([len(set(ids.tolist()) & set(truth.tolist())) / 10
+                      for (ids, _), truth in zip(results, expected)])
+    assert recall >= min_recall
+    if min_recall == 1.0:
+        assert [ids.tolist() for ids, _ in results] == expected.tolist()
+
+
+def test_quantized_without_rerank_keeps_only_codes():
+    vectors = random_vectors(2000)
+    index = VectorIndex(DIMENSION, quantization="int8", rerank=1)
+    index.insert(vectors)
+
+    assert not index.stores_vectors
+    assert index.vectors.nbytes == 0
+    assert index.resident_bytes() < 2000 * DIMENSION * 4
+    # Inserts after training are encoded straight to codes
+    index.insert(random_vectors(1, seed=3), ids=[9000])
+    assert index.search(random_vectors(1, seed=3)[0], k=1)[0].tolist() == [9000]
@@ -0,0 +1,415 @@
+import logging
+import threading
+import numpy as np
+from quantization import make_quantizer
+
+logger = logging.getLogger(__name__)
+
+# Vectors needed before a quantizer is trained; searches are exact until then
+QUANTIZER_MIN_TRAIN = 1024
+
+
+def normalize(vectors):
+    """
+    Scales rows to unit length so cosine similarity becomes a dot product.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores, k):
+    """
+    Indices of the k highest scores, best first, without a full sort.
+    """
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(scores, -k)[-k:]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def top_k_rows(scores, k):
+    """
+    Row-wise top-k of a (queries, candidates) score matrix, best first.
+    :return: (indices, scores) arrays of shape (queries, k)
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    candidates = np.argpartition(scores, -k, axis=1)[:, -k:]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    return (np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1))
+
+
+def spherical_kmeans(vectors, n_clusters, iterations=20, seed=0):
+    """
+    k-means on unit vectors, maximising cosine similarity to the centroids.
+    :return: (n_clusters, dimension) array of unit centroids
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        # Reseed empty clusters from random points
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+class VectorIndex:
+    """
+    In-process cosine-similarity vector store.
+
+    Embeddings live in one contiguous float32 matrix of pre-normalised rows,
+    so a search is a single matrix-vector product followed by an
+    argpartition top-k. In "ivf" mode, once the collection holds enough
+    vectors a spherical k-means coarse quantizer is trained and searches only
+    scan the nprobe closest inverted lists.
+
+    With quantization set to "int8" or "pq", every row is also kept as a
+    compact code and searches scan the codes instead of the float matrix.
+    The best k * rerank coarse candidates are then re-scored exactly against
+    their float rows; rerank=1 returns the coarse ranking as is. Only the
+    codes stay in memory once the quantizer is trained with rerank=1; with
+    re-ranking the float rows are kept as well, so in-memory quantization
+    only saves memory without it (PersistentVectorIndex keeps the float rows
+    on disk instead).
+
+    Deletes are tombstones; the matrix is compacted once more than half of
+    its rows are dead.
+    """
+
+    def __init__(self, dimension, mode="flat", nlist=64, nprobe=8, capacity=1024,
+                 quantization=None, pq_m=8, rerank=4):
+        if mode not in ("flat", "ivf"):
+            raise ValueError(f"Unknown index mode: {mode}")
+        if quantization not in (None, "int8", "pq"):
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.dimension = dimension
+        self.mode = mode
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.size = 0
+        self.vectors = np.empty((capacity, dimension), dtype=np.float32)
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.live = np.zeros(capacity, dtype=bool)
+        self.id_to_row = {}
+        self.metadata = {}
+        self.next_id = 0
+        # Bumped whenever rows are renumbered, for structures addressed by row
+        self.row_epoch = 0
+
+        self.centroids = None
+        self.assignments = np.empty(capacity, dtype=np.int32)
+        self._list_offsets = None
+        self._list_rows = None
+
+        self.quantization = quantization
+        self.pq_m = pq_m
+        self.rerank = rerank
+        self.quantizer = None
+        self.codes = None
+
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.id_to_row)
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    @property
+    def quantized(self):
+        return self.quantizer is not None
+
+    @property
+    def stores_vectors(self):
+        # Quantized without re-ranking, nothing reads the float rows
+        return not (self.quantized and self.rerank <= 1)
+
+    def resident_bytes(self):
+        """
+        Bytes of row storage held in process memory. Memory-mapped arrays
+        are left out, they live in the shared page cache.
+        """
+        arrays = (self.vectors, self.codes, self.ids, self.live, self.assignments)
+        return sum(array.nbytes for array in arrays
+                   if array is not None and not isinstance(array, np.memmap))
+
+    def _float_rows(self, rows):
+        # Float rows, or their decoded codes once only the codes are kept
+        if self.stores_vectors:
+            return np.asarray(self.vectors[rows])
+        return self.quantizer.decode(self.codes[rows])
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        if self.stores_vectors:
+            self.vectors = np.resize(self.vectors, (capacity, self.dimension))
+        self.ids = np.resize(self.ids, capacity)
+        self.live = np.concatenate([self.live[:self.size],
+                                    np.zeros(capacity - self.size, dtype=bool)])
+        self.assignments = np.resize(self.assignments, capacity)
+        if self.codes is not None:
+            self.codes = np.resize(self.codes, (capacity, self.codes.shape[1]))
+
+    def insert(self, vectors, ids=None, metadata=None):
+        """
+        Adds or replaces vectors.
+        :param vectors: (n, dimension) array-like
+        :param ids: Optional integer ids; new ids are assigned when omitted
+        :param metadata: Optional list of dicts stored alongside each id
+        :return: List of ids
+        """
+        vectors = normalize(vectors)
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-d vectors, got {vectors.shape[1]}-d")
+        with self.lock:
+            if ids is None:
+                ids = list(range(self.next_id, self.next_id + len(vectors)))
+            ids = [int(i) for i in ids]
+            self.delete([i for i in ids if i in self.id_to_row])
+
+            start = self.size
+            assignments = None
+            if self.trained:
+                assignments = np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+                self._list_offsets = None
+            codes = self.quantizer.encode(vectors) if self.quantized else None
+            self._write_rows(vectors, np.asarray(ids, dtype=np.int64), assignments, codes, metadata)
+            for offset, vector_id in enumerate(ids):
+                self.id_to_row[vector_id] = start + offset
+                if metadata is not None:
+                    self.metadata[vector_id] = metadata[offset]
+            self.next_id = max(self.next_id, max(ids, default=-1) + 1)
+            self.size = start + len(vectors)
+
+            if self.mode == "ivf" and not self.trained and len(self) >= self.nlist * 39:
+                self.train()
+            if self.quantization and not self.quantized and len(self) >= QUANTIZER_MIN_TRAIN:
+                self.train_quantizer()
+            return ids
+
+    def _write_rows(self, vectors, ids, assignments, codes, metadata):
+        # Storage hook: place new rows after the current ones
+        self._reserve(len(vectors))
+        rows = slice(self.size, self.size + len(vectors))
+        if self.stores_vectors:
+            self.vectors[rows] = vectors
+        self.ids[rows] = ids
+        self.live[rows] = True
+        if assignments is not None:
+            self.assignments[rows] = assignments
+        if codes is not None:
+            self.codes[rows] = codes
+
+    def _write_deletes(self, rows):
+        # Storage hook: record removed rows
+        pass
+
+    def delete(self, ids):
+        """
+        Removes vectors by id.
+        :return: Number of vectors removed
+        """
+        with self.lock:
+            removed = []
+            for vector_id in ids:
+                row = self.id_to_row.pop(int(vector_id), None)
+                if row is None:
+                    continue
+                self.live[row] = False
+                self.metadata.pop(int(vector_id), None)
+                removed.append(row)
+            if removed:
+                self._write_deletes(removed)
+            if self.size and len(self.id_to_row) < self.size // 2:
+                self.compact()
+            return len(removed)
+
+    def compact(self):
+        """
+        Drops deleted rows from the matrix.
+        """
+        with self.lock:
+            keep = np.flatnonzero(self.live[:self.size])
+            count = len(keep)
+            if self.stores_vectors:
+                self.vectors[:count] = self.vectors[keep]
+            self.ids[:count] = self.ids[keep]
+            self.assignments[:count] = self.assignments[keep]
+            if self.codes is not None:
+                self.codes[:count] = self.codes[keep]
+            self.live[:count] = True
+            self.live[count:] = False
+            self.size = count
+            self.id_to_row = {int(vector_id): row for row, vector_id in enumerate(self.ids[:count])}
+            self._list_offsets = None
+            self.row_epoch += 1
+
+    def train(self, nlist=None, iterations=20, sample_size=None):
+        """
+        Trains the IVF coarse quantizer on the live vectors.
+        """
+        with self.lock:
+            live_rows = np.flatnonzero(self.live[:self.size])
+            nlist = min(nlist or self.nlist, len(live_rows))
+            if nlist == 0:
+                return
+            sample = live_rows
+            sample_size = sample_size or nlist * 256
+            if len(sample) > sample_size:
+                sample = np.random.default_rng(0).choice(sample, sample_size, replace=False)
+            logger.info(f"Training IVF quantizer with {nlist} lists on {len(sample)} vectors")
+            self.centroids = spherical_kmeans(normalize(self._float_rows(np.sort(sample))),
+                                              nlist, iterations)
+            self.nlist = nlist
+            for start in range(0, self.size, 65536):
+                stop = min(start + 65536, self.size)
+                self.assignments[start:stop] = np.argmax(
+                    self._float_rows(slice(start, stop)) @ self.centroids.T, axis=1)
+            self._list_offsets = None
+
+    def train_quantizer(self, sample_size=65536):
+        """
+        Trains the int8 or PQ quantizer on the live vectors and encodes every row.
+        """
+        with self.lock:
+            live_rows = np.flatnonzero(self.live[:self.size])
+            if not self.quantization or len(live_rows) == 0:
+                return
+            sample = live_rows
+            if len(sample) > sample_size:
+                sample = np.random.default_rng(0).choice(sample, sample_size, replace=False)
+            logger.info(f"Training {self.quantization} quantizer on {len(sample)} vectors")
+            quantizer = make_quantizer(self.quantization, self.dimension, self.pq_m)
+            quantizer.fit(self._float_rows(np.sort(sample)))
+            codes = np.empty((len(self.ids), quantizer.code_size), dtype=np.uint8)
+            for start in range(0, self.size, 65536):
+                stop = min(start + 65536, self.size)
+                codes[start:stop] = quantizer.encode(self._float_rows(slice(start, stop)))
+            self.quantizer = quantizer
+            self.codes = codes
+            if not self.stores_vectors:
+                # The codes replace the float rows
+                self.vectors = np.empty((0, self.dimension), dtype=np.float32)
+
+    def _scores(self, queries, rows=None):
+        # Coarse scores of the given rows (all rows when None)
+        if self.quantized:
+            codes = self.codes[:self.size] if rows is None else self.codes[rows]
+            return self.quantizer.score(queries, codes)
+        vectors = self.vectors[:self.size] if rows is None else self.vectors[rows]
+        return queries @ vectors.T
+
+    def _inverted_lists(self):
+        # Rows grouped by list (CSR layout), rebuilt lazily after changes
+        if self._list_offsets is None:
+            assignments = self.assignments[:self.size]
+            self._list_rows = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=self.nlist)
+            self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        return self._list_offsets, self._list_rows
+
+    def _candidate_rows(self, query, nprobe):
+        if not self.trained:
+            return None
+        offsets, rows = self._inverted_lists()
+        probes = top_k(self.centroids @ query, nprobe or self.nprobe)
+        return np.concatenate([rows[offsets[p]:offsets[p + 1]] for p in probes])
+
+    def search(self, query, k=5, nprobe=None, rerank=None):
+        """
+        Finds the k vectors most similar to the query.
+        :param query: (dimension,) array-like
+        :param k: Number of results
+        :param nprobe: IVF lists to scan, defaults to the index's nprobe
+        :param rerank: Coarse candidates per result to re-score exactly when
+            quantized, defaults to the index's rerank
+        :return: (ids, scores) arrays, best first
+        """
+        query = normalize(query)[0]
+        with self.lock:
+            if self.quantized:
+                return self.search_many(query[None, :], k=k, nprobe=nprobe, rerank=rerank)[0]
+            candidates = self._candidate_rows(query, nprobe)
+            if candidates is None:
+                scores = self.vectors[:self.size] @ query
+                scores[~self.live[:self.size]] = -np.inf
+                rows = top_k(scores, k)
+                rows = rows[np.isfinite(scores[rows])]
+                return self.ids[rows].copy(), scores[rows]
+
+            candidates = candidates[self.live[candidates]]
+            scores = self.vectors[candidates] @ query
+            best = top_k(scores, k)
+            return self.ids[candidates[best]].copy(), scores[best]
+
+    def search_many(self, queries, k=5, nprobe=None, threshold=None, rerank=None):
+        """
+        Searches for several queries with a single matrix-matrix product.
+        :param queries: (n, dimension) array-like
+        :param k: Number of results per query
+        :param nprobe: IVF lists to scan per query
+        :param threshold: Optional minimum cosine score
+        :param rerank: Coarse candidates per result to re-score exactly when
+            quantized, defaults to the index's rerank
+        :return: List of (ids, scores) pairs, one per query, best first
+        """
+        queries = normalize(queries)
+        with self.lock:
+            if self.trained:
+                # Score the union of every query's probed lists at once, then
+                # hide the rows outside each query's own probes
+                offsets, list_rows = self._inverted_lists()
+                probe_scores = queries @ self.centroids.T
+                probes, _ = top_k_rows(probe_scores, nprobe or self.nprobe)
+                probed = np.zeros((len(queries), self.nlist), dtype=bool)
+                np.put_along_axis(probed, probes, True, axis=1)
+                lists = np.flatnonzero(probed.any(axis=0))
+                rows = np.concatenate([list_rows[offsets[p]:offsets[p + 1]] for p in lists]) \
+                    if len(lists) else np.empty(0, dtype=np.int64)
+                rows = rows[self.live[rows]]
+                scores = self._scores(queries, rows)
+                scores[~probed[:, self.assignments[rows]]] = -np.inf
+            else:
+                rows = np.flatnonzero(self.live[:self.size])
+                scores = self._scores(queries)
+                scores = scores[:, rows] if len(rows) < self.size else scores
+
+            rerank = self.rerank if rerank is None else int(rerank)
+            if self.quantized and rerank > 1 and self.stores_vectors:
+                # Exact float scores for the best coarse candidates only
+                candidates, coarse = top_k_rows(scores, k * rerank)
+                exact = np.einsum("qd,qcd->qc", queries,
+                                  np.asarray(self.vectors[rows[candidates]]))
+                exact[~np.isfinite(coarse)] = -np.inf
+                best, best_scores = top_k_rows(exact, k)
+                best = np.take_along_axis(candidates, best, axis=1)
+            else:
+                best, best_scores = top_k_rows(scores, k)
+            results = []
+            for query_best, query_scores in zip(best, best_scores):
+                keep = np.isfinite(query_scores)
+                if threshold is not None:
+                    keep &= query_scores >= threshold
+                results.append((self.ids[rows[query_best[keep]]].copy(), query_scores[keep]))
+            return results